@@ -0,0 +1,119 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'api:version:{}'
+RESPONSE_KEY = 'api:response:{}'
+
+
+def new_version():
+    # a fresh version never repeats one lost together with an evicted key
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*scopes):
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), None)
+
+
+def invalidate(*scopes):
+    '''
+    Drop the cached responses of the scopes right away and once more
+    after commit, so a read racing the transaction can not keep old data
+    '''
+    bump_versions(*scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+class CachedListMixin:
+    '''
+    Caches the data of list responses and answers conditional GETs,
+    both keyed by the normalized url and the versions of the scopes
+    from `get_cache_scopes()`, so neither needs the database
+    '''
+    cache_timeout = getattr(settings, 'API_CACHE_TIMEOUT', 300)
+    cache_scopes = ()
+
+    def get_cache_scopes(self):
+        return self.cache_scopes
+
+    def get_cache_signature(self):
+        request = self.request
+        query = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        raw = repr((
+            request.get_host(), request.path, query,
+            get_versions(self.get_cache_scopes()),
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def get_etag(self, signature):
+        # every rendered representation gets its own tag
+        raw = f'{signature}:{self.request.accepted_renderer.format}'
+        return '"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+    def get_if_none_match(self):
+        header = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return set()
+        return {tag.strip() for tag in header.split(',')}
+
+    def not_modified(self, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+
+    def cached(self, handler, request, *args, **kwargs):
+        signature = self.get_cache_signature()
+        etag = self.get_etag(signature)
+        tags = self.get_if_none_match()
+        if etag in tags or f'W/{etag}' in tags:
+            return self.not_modified(etag)
+
+        key = RESPONSE_KEY.format(signature)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, self.cache_timeout)
+        if '*' in tags:
+            # matches any representation, once there is one
+            return self.not_modified(etag)
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+
+class CachedReadMixin(CachedListMixin):
+    '''Caches retrieve responses the same way as the list ones'''
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
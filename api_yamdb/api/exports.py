@@ -0,0 +1,68 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+# rows fetched per round trip of the server-side cursor
+CHUNK_SIZE = 2000
+# lines joined into one chunk of the response
+LINES_PER_CHUNK = 500
+
+
+class Echo:
+    '''File-like object handing back what csv.writer writes'''
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(names, items):
+    for item in items:
+        yield json.dumps(item, ensure_ascii=False) + '\n'
+
+
+def csv_lines(names, items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(names)
+    for item in items:
+        yield writer.writerow(item.values())
+
+
+# ?output= -> (content type, extension, line generator)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson', ndjson_lines),
+    'csv': ('text/csv; charset=utf-8', 'csv', csv_lines),
+}
+
+
+def chunked(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == LINES_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def export_response(queryset, serializer_class, output, name):
+    '''
+    Stream the queryset through a ValuesSerializer, its rows are read
+    in chunks by a server-side cursor (postgres) and never turned
+    into model instances
+    '''
+    content_type, extension, lines = EXPORT_FORMATS[output]
+    serializer = serializer_class()
+    rows = serializer.project(
+        queryset.order_by('pk')
+    ).iterator(chunk_size=CHUNK_SIZE)
+    items = (serializer.to_representation(row) for row in rows)
+    names = [name for name, _ in serializer.fields]
+    response = StreamingHttpResponse(
+        chunked(lines(names, items)), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{extension}"'
+    )
+    return response
@@ -1,18 +1,126 @@
-from django_filters import CharFilter, FilterSet
-from reviews.models import Title
+from django.db.models import Exists, OuterRef
+from django_filters import (CharFilter, ChoiceFilter, FilterSet,
+                            IsoDateTimeFilter, NumberFilter)
+from rest_framework.filters import BaseFilterBackend
+from reviews.models import Comment, GenreTitle, Review, Title
+
+from .search import search
+from .slugs import category_slugs, genre_slugs
 
 
 class TitleFilter(FilterSet):
+    '''
+    Slugs are resolved to ids by the process caches, genres are matched
+    with EXISTS semi-joins, so a title never repeats whatever genres match
+    '''
     category = CharFilter(field_name='category', method='filter_category')
-    name = CharFilter(field_name='name', lookup_expr='contains')
+    # UPPER(name) LIKE is served by the trigram index on postgres
+    name = CharFilter(field_name='name', lookup_expr='icontains')
     genre = CharFilter(field_name='genre', method='filter_genre')
+    # any (default) of the genres or all of them
+    genre_mode = ChoiceFilter(
+        choices=(('any', 'any'), ('all', 'all')), method='filter_genre_mode'
+    )
 
     def filter_category(self, queryset, name, category):
-        return queryset.filter(category__slug__in=category.split(','))
+        ids = category_slugs.get_ids(category.split(','))
+        return queryset.filter(category_id__in=ids)
 
     def filter_genre(self, queryset, name, genre):
-        return queryset.filter(genre__slug__in=genre.split(','))
+        slugs = set(genre.split(','))
+        ids = genre_slugs.get_ids(slugs)
+        if self.form.cleaned_data.get('genre_mode') != 'all':
+            if not ids:
+                return queryset.none()
+            return queryset.annotate(has_genre=Exists(
+                GenreTitle.objects.filter(
+                    title=OuterRef('pk'), genre_id__in=ids
+                )
+            )).filter(has_genre=True)
+        if len(ids) < len(slugs):
+            return queryset.none()
+        # one probe of the (title, genre) index per genre
+        conditions = {
+            f'has_genre_{genre_id}': Exists(GenreTitle.objects.filter(
+                title=OuterRef('pk'), genre_id=genre_id
+            ))
+            for genre_id in ids
+        }
+        return queryset.annotate(**conditions).filter(
+            **{name: True for name in conditions}
+        )
+
+    def filter_genre_mode(self, queryset, name, mode):
+        # read by filter_genre
+        return queryset
 
     class Meta():
         model = Title
-        fields = ['name', 'category', 'year', 'genre']
+        fields = ['name', 'category', 'year', 'genre', 'genre_mode']
+
+
+class ReviewExportFilter(FilterSet):
+    '''Exported reviews of a title, an author or a period [since, until)'''
+    title = NumberFilter(field_name='title_id')
+    author = CharFilter(field_name='author__username')
+    since = IsoDateTimeFilter(field_name='pub_date', lookup_expr='gte')
+    until = IsoDateTimeFilter(field_name='pub_date', lookup_expr='lt')
+
+    class Meta():
+        model = Review
+        fields = ['title', 'author', 'since', 'until']
+
+
+class CommentExportFilter(ReviewExportFilter):
+    title = NumberFilter(field_name='review__title_id')
+    review = NumberFilter(field_name='review_id')
+
+    class Meta():
+        model = Comment
+        fields = ['title', 'review', 'author', 'since', 'until']
+
+
+class TitleOrderingFilter(BaseFilterBackend):
+    '''
+    ?ordering= by the stored and indexed title columns,
+    id in the same direction breaks the ties
+    '''
+    ordering_param = 'ordering'
+    ordering_fields = {
+        'rating': 'rating_avg',
+        'reviews_count': 'rating_count',
+        'year': 'year',
+        'name': 'name',
+    }
+
+    def get_ordering(self, request):
+        value = request.query_params.get(self.ordering_param, '').strip()
+        name = value.lstrip('-')
+        if name not in self.ordering_fields:
+            return None
+        direction = '-' if value.startswith('-') else ''
+        return (
+            direction + self.ordering_fields[name], direction + 'id'
+        )
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request)
+        if ordering is None:
+            return queryset
+        return queryset.order_by(*ordering)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    '''
+    Ranked full text search by ?search=, views with `search_required`
+    return nothing without a query
+    '''
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if text:
+            return search(queryset, text)
+        if getattr(view, 'search_required', False):
+            return queryset.none()
+        return queryset
@@ -0,0 +1,58 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def is_utf8(encoding):
+    return codecs.lookup(encoding).name == 'utf-8'
+
+
+def loads(data):
+    '''orjson when installed, bytes in UTF-8'''
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+class FastJSONParser(JSONParser):
+    '''JSONParser decoding UTF-8 bodies with orjson when it is installed'''
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not is_utf8(encoding):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as error:
+            raise ParseError(f'JSON parse error - {error}')
+
+
+class NDJSONParser(BaseParser):
+    '''One JSON object per line, parsed into a list'''
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        utf8 = is_utf8(encoding)
+        items = []
+        for number, line in enumerate(stream, 1):
+            if not utf8:
+                line = line.decode(encoding).encode()
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(loads(line))
+            except ValueError as error:
+                raise ParseError(f'Строка {number}: {error}')
+        return items
@@ -0,0 +1,156 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from reviews.models import Comment, Review, Title
+
+from .cache import get_versions
+
+# must match the text search configuration of the reviews triggers
+SEARCH_CONFIG = 'simple'
+# pg_trgm similarity a fallback match must reach
+TRIGRAM_THRESHOLD = 0.3
+
+# model -> (weighted text fields, trigram fallback field, version scope)
+SEARCH_MODELS = {
+    Title: ((('name', 1.0), ('description', 0.4)), 'name', 'search:titles'),
+    Review: ((('text', 1.0),), None, 'search:reviews'),
+    Comment: ((('text', 1.0),), None, 'search:comments'),
+}
+
+WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def trigrams(text):
+    '''Trigrams of the words the way pg_trgm builds them'''
+    grams = set()
+    for word in tokenize(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(first, second):
+    first, second = trigrams(first), trigrams(second)
+    if not first or not second:
+        return 0
+    return len(first & second) / len(first | second)
+
+
+def order_by_ids(queryset, ids):
+    '''Keep the rank order of ids computed outside the database'''
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *[When(pk=pk, then=Value(position))
+          for position, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    ))
+
+
+class PostgresSearchBackend:
+    '''tsvector columns kept by triggers, GIN indexed, ranked by ts_rank'''
+
+    def search(self, queryset, text):
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        found = queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', 'pk')
+        fallback = SEARCH_MODELS[queryset.model][1]
+        if fallback is None or found.exists():
+            return found
+        return queryset.annotate(
+            rank=TrigramSimilarity(fallback, text)
+        ).filter(rank__gte=TRIGRAM_THRESHOLD).order_by('-rank', 'pk')
+
+
+class PythonSearchBackend:
+    '''
+    In-process inverted index for databases without full text search,
+    rebuilt when the version of the model's search scope changes
+    '''
+
+    def __init__(self):
+        self.indexes = {}
+
+    def get_index(self, model):
+        fields, fallback, scope = SEARCH_MODELS[model]
+        version = get_versions([scope])[0]
+        index = self.indexes.get(model)
+        if index is not None and index['version'] == version:
+            return index
+        postings = defaultdict(dict)
+        texts = {}
+        documents = 0
+        names = [name for name, _ in fields]
+        for row in model.objects.values_list('pk', *names).iterator():
+            pk, values = row[0], row[1:]
+            documents += 1
+            weights = Counter()
+            for (name, weight), value in zip(fields, values):
+                for token in tokenize(value or ''):
+                    weights[token] += weight
+            for token, weight in weights.items():
+                postings[token][pk] = weight
+            if fallback is not None:
+                texts[pk] = values[names.index(fallback)] or ''
+        index = {
+            'version': version, 'postings': postings, 'texts': texts,
+            'documents': documents,
+        }
+        self.indexes[model] = index
+        return index
+
+    def rank(self, index, tokens):
+        postings = [index['postings'].get(token, {}) for token in tokens]
+        if not postings or not all(postings):
+            return []
+        # every word must match, like plainto_tsquery
+        ids = set.intersection(*(set(posting) for posting in postings))
+        scores = Counter()
+        for posting in postings:
+            idf = math.log(1 + index['documents'] / len(posting))
+            for pk in ids:
+                scores[pk] += posting[pk] * idf
+        return sorted(ids, key=lambda pk: (-scores[pk], pk))
+
+    def search(self, queryset, text):
+        model = queryset.model
+        index = self.get_index(model)
+        ids = self.rank(index, tokenize(text))
+        if not ids and SEARCH_MODELS[model][1] is not None:
+            scores = {
+                pk: similarity(text, value)
+                for pk, value in index['texts'].items()
+            }
+            ids = sorted(
+                (pk for pk, score in scores.items()
+                 if score >= TRIGRAM_THRESHOLD),
+                key=lambda pk: (-scores[pk], pk),
+            )
+        return order_by_ids(queryset, ids)
+
+
+_backends = {}
+
+
+def get_search_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        _backends[vendor] = (
+            PostgresSearchBackend() if vendor == 'postgresql'
+            else PythonSearchBackend()
+        )
+    return _backends[vendor]
+
+
+def search(queryset, text):
+    return get_search_backend().search(queryset, text)
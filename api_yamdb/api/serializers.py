@@ -1,6 +1,11 @@
-from django.shortcuts import get_object_or_404
+from collections import defaultdict
+from datetime import datetime
+
 from rest_framework import serializers
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.models import (Category, Comment, Genre, GenreTitle,
+                            LeaderboardEntry, Review, Title, TitleStats, User)
+
+from .slugs import category_slugs, genre_slugs
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -17,9 +22,68 @@ class GenreSerializer(serializers.ModelSerializer):
         lookup_field = 'slug'
 
 
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='title_id')
+    name = serializers.CharField(source='title.name')
+    year = serializers.IntegerField(source='title.year')
+    rating = serializers.SerializerMethodField()
+
+    class Meta():
+        model = LeaderboardEntry
+        fields = ('position', 'id', 'name', 'year', 'rating', 'reviews_count')
+
+    def get_rating(self, entry):
+        # one decimal, as Title.rating
+        return round(entry.rating, 1)
+
+
+class GenreLeaderboardSerializer(GenreSerializer):
+    titles = LeaderboardEntrySerializer(source='leaderboard', many=True)
+
+    class Meta(GenreSerializer.Meta):
+        fields = ('name', 'slug', 'titles')
+
+
+class CategoryLeaderboardSerializer(CategorySerializer):
+    titles = LeaderboardEntrySerializer(source='leaderboard', many=True)
+
+    class Meta(CategorySerializer.Meta):
+        fields = ('name', 'slug', 'titles')
+
+
+class TitleStatsSerializer(serializers.ModelSerializer):
+    scores = serializers.ReadOnlyField()
+
+    class Meta():
+        model = TitleStats
+        fields = ('total', 'scores', 'last_review_at')
+
+
+class CachedSlugRelatedField(serializers.SlugRelatedField):
+    '''SlugRelatedField resolving slugs from a process-local SlugCache'''
+
+    def __init__(self, slugs, **kwargs):
+        self.slugs = slugs
+        kwargs.setdefault('queryset', slugs.model.objects.all())
+        super().__init__(slug_field='slug', **kwargs)
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def to_representation(self, value):
+        return self.slugs.get_row(value.pk)[2]
+
+    def to_internal_value(self, data):
+        pk = self.slugs.get_id(str(data))
+        if pk is None:
+            self.fail('does_not_exist', slug_name='slug', value=data)
+        return self.slugs.get_instance(pk)
+
+
 class TitleListSerializer(serializers.ModelSerializer):
-    category = CategorySerializer()
-    genre = GenreSerializer(many=True)
+    # nested {name, slug} from the process caches instead of joins
+    category = serializers.SerializerMethodField()
+    genre = serializers.SerializerMethodField()
 
     class Meta():
         model = Title
@@ -27,15 +91,27 @@ class TitleListSerializer(serializers.ModelSerializer):
             'id', 'name', 'year', 'description', 'rating', 'genre', 'category',
         )
 
+    def get_category(self, title):
+        if title.category_id is None:
+            return None
+        return category_slugs.serialize(title.category_id)
+
+    def get_genre(self, title):
+        # genres_of_title is prefetched by TitleViewSet
+        genres = [
+            genre_slugs.serialize(link.genre_id)
+            for link in title.genres_of_title.all()
+        ]
+        return sorted(
+            filter(None, genres), key=lambda genre: genre['name'],
+            reverse=True,
+        )
+
 
 class TitleSerializer(serializers.ModelSerializer):
-    category = serializers.SlugRelatedField(
-        slug_field='slug', queryset=Category.objects.all()
-    )
+    category = CachedSlugRelatedField(category_slugs)
 
-    genre = serializers.SlugRelatedField(
-        slug_field='slug', queryset=Genre.objects.all(), many=True,
-    )
+    genre = CachedSlugRelatedField(genre_slugs, many=True)
 
     class Meta():
         model = Title
@@ -43,6 +119,15 @@ class TitleSerializer(serializers.ModelSerializer):
             'id', 'name', 'year', 'description', 'rating', 'category', 'genre'
         )
 
+    def validate_year(self, value):
+        # the same limit as the check constraint of the table
+        max_year = datetime.today().year + 10
+        if value > max_year:
+            raise serializers.ValidationError(
+                f'Год не может быть позже {max_year}.'
+            )
+        return value
+
     def validate(self, data, *args, **kwargs):
         if not self.partial and not data['genre']:
             raise serializers.ValidationError({
@@ -86,10 +171,10 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         if self.context['request'].method == 'POST':
-            id_title = self.context[
-                'request'].parser_context['kwargs']['title_id']
-            title = get_object_or_404(Title, pk=id_title)
-            if title.reviews.filter(
+            view = self.context['view']
+            view.check_parent()
+            if Review.objects.filter(
+                    title_id=view.kwargs['title_id'],
                     author=self.context['request'].user
             ).exists():
                 raise serializers.ValidationError(
@@ -111,3 +196,208 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta():
         fields = ('id', 'text', 'author', 'pub_date')
         model = Comment
+
+
+class ReviewSearchSerializer(ReviewSerializer):
+    class Meta(ReviewSerializer.Meta):
+        fields = ReviewSerializer.Meta.fields + ('title',)
+
+
+class CommentSearchSerializer(CommentSerializer):
+    title = serializers.IntegerField(source='review.title_id', read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ('review', 'title')
+        read_only_fields = ('review',)
+
+
+class ValuesSerializer:
+    '''
+    Read-only twin of a model serializer working on values_list() rows:
+    no model instances and no field objects per row, the output is the
+    same as the one of the model serializer.
+    Only the columns of the shown fields are read: context `fields`
+    keeps a subset of them, context `expand` adds `expandable` ones
+    '''
+    # (output name, lookup) pairs, fields without a lookup are
+    # computed by get_<name>(row) from the `method_lookups` of the name
+    fields = ()
+    method_lookups = {}
+    # ?expand= name -> lookups read by get_<name>(row)
+    expandable = {}
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        shown = self.context.get('fields')
+        expand = self.context.get('expand', ())
+        self.fields = tuple(
+            (name, lookup) for name, lookup in type(self).fields
+            if not shown or name in shown
+        ) + tuple((name, None) for name in self.expandable if name in expand)
+
+    @classmethod
+    def field_names(cls):
+        return [name for name, _ in cls.fields]
+
+    def get_lookups(self):
+        lookups = []
+        for name, lookup in self.fields:
+            if lookup is not None:
+                lookups.append(lookup)
+            else:
+                lookups.extend(
+                    self.method_lookups.get(name, ())
+                    or self.expandable.get(name, ())
+                )
+        return lookups
+
+    def project(self, queryset, extra_lookups=()):
+        '''
+        Rows with the lookups of the shown fields and `extra_lookups`,
+        named to keep attribute access for keyset cursors
+        '''
+        lookups = dict.fromkeys(self.get_lookups() + list(extra_lookups))
+        return queryset.prefetch_related(None).values_list(
+            *lookups, named=True
+        )
+
+    def load(self, rows):
+        '''Read what the rows refer to, once for all of them'''
+
+    def to_representation(self, row):
+        data = {}
+        for name, lookup in self.fields:
+            if lookup is None:
+                value = getattr(self, f'get_{name}')(row)
+            else:
+                value = getattr(row, lookup)
+            if isinstance(value, datetime):
+                value = self.datetime_field.to_representation(value)
+            data[name] = value
+        return data
+
+    @property
+    def data(self):
+        if not self.many:
+            self.load([self.instance])
+            return self.to_representation(self.instance)
+        rows = list(self.instance)
+        self.load(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+class TitleValuesSerializer(ValuesSerializer):
+    '''
+    TitleListSerializer output, ?expand=stats as /stats/,
+    genre ids of all rows in one query
+    '''
+    fields = (
+        ('id', 'id'), ('name', 'name'), ('year', 'year'),
+        ('description', 'description'), ('rating', None), ('genre', None),
+        ('category', None),
+    )
+    method_lookups = {
+        'rating': ('rating_sum', 'rating_count'),
+        'genre': ('id',),
+        'category': ('category_id',),
+    }
+    expandable = {
+        'stats': tuple(
+            f'stats__score_{score}' for score in TitleStats.SCORES
+        ) + ('stats__total', 'stats__last_review_at'),
+    }
+
+    def load(self, rows):
+        # the slug maps are checked once for all the rows
+        self.categories = category_slugs.load()
+        self.genre_slugs = genre_slugs.load()
+        self.genres = defaultdict(list)
+        if 'genre' not in dict(self.fields):
+            return
+        links = GenreTitle.objects.filter(
+            title_id__in=[row.id for row in rows]
+        ).order_by().values_list('title_id', 'genre_id')
+        for title_id, genre_id in links:
+            self.genres[title_id].append(genre_id)
+
+    def get_rating(self, row):
+        if row.rating_count:
+            return round(row.rating_sum / row.rating_count, 1)
+        return None
+
+    def get_genre(self, row):
+        genres = (
+            self.genre_slugs.serialize(pk) for pk in self.genres[row.id]
+        )
+        return sorted(
+            filter(None, genres), key=lambda genre: genre['name'],
+            reverse=True,
+        )
+
+    def get_category(self, row):
+        if row.category_id is None:
+            return None
+        return self.categories.serialize(row.category_id)
+
+    def get_stats(self, row):
+        # the output of /stats/, a title nobody reviewed may have no row
+        stats = TitleStats(
+            total=row.stats__total or 0,
+            last_review_at=row.stats__last_review_at,
+            **{
+                f'score_{score}': getattr(row, f'stats__score_{score}') or 0
+                for score in TitleStats.SCORES
+            }
+        )
+        return TitleStatsSerializer(stats).data
+
+
+class UserValuesSerializer(ValuesSerializer):
+    fields = tuple(
+        (name, name) for name in UserViewSetSerializer.Meta.fields
+    )
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    fields = (
+        ('id', 'id'), ('text', 'text'), ('author', 'author__username'),
+        ('score', 'score'), ('pub_date', 'pub_date'),
+    )
+    expandable = {'title': ('title_id', 'title__name', 'title__year')}
+
+    def get_title(self, row):
+        return {
+            'id': row.title_id, 'name': row.title__name,
+            'year': row.title__year,
+        }
+
+
+class ReviewExportSerializer(ReviewValuesSerializer):
+    fields = ReviewValuesSerializer.fields + (('title', 'title_id'),)
+    expandable = {}
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    fields = (
+        ('id', 'id'), ('text', 'text'), ('author', 'author__username'),
+        ('pub_date', 'pub_date'),
+    )
+    expandable = {
+        'review': ('review_id', 'review__author__username', 'review__score'),
+    }
+
+    def get_review(self, row):
+        return {
+            'id': row.review_id, 'author': row.review__author__username,
+            'score': row.review__score,
+        }
+
+
+class CommentExportSerializer(CommentValuesSerializer):
+    fields = CommentValuesSerializer.fields + (
+        ('review', 'review_id'), ('title', 'review__title_id'),
+    )
+    expandable = {}
@@ -0,0 +1,54 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+
+from .cache import invalidate
+
+
+@receiver((post_save, post_delete), sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate('categories')
+
+
+@receiver((post_save, post_delete), sender=Genre)
+def genre_changed(sender, instance, **kwargs):
+    invalidate('genres')
+
+
+@receiver((post_save, post_delete), sender=Title)
+def title_changed(sender, instance, **kwargs):
+    invalidate(
+        'titles', f'title:{instance.pk}', f'reviews:{instance.pk}',
+        'search:titles',
+    )
+
+
+@receiver((post_save, post_delete), sender=GenreTitle)
+def title_genres_changed(sender, instance, **kwargs):
+    invalidate('titles', f'title:{instance.title_id}')
+
+
+@receiver((post_save, post_delete), sender=Review)
+def review_changed(sender, instance, **kwargs):
+    # the rating of the title changes with its reviews
+    invalidate(
+        'titles', f'title:{instance.title_id}', f'reviews:{instance.title_id}',
+        f'comments:{instance.pk}', 'search:reviews',
+    )
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    invalidate(f'comments:{instance.review_id}', 'search:comments')
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate('users')
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate('users')
@@ -0,0 +1,91 @@
+from django.db import router
+from reviews.models import Category, Genre
+
+from .cache import get_versions
+
+
+class SlugMaps:
+    '''
+    slug -> row and id -> row maps of one version of a SlugCache,
+    looked up without asking the shared cache for the version again
+    '''
+
+    def __init__(self, slugs, rows):
+        self.slugs = slugs
+        self.by_slug = {row[2]: row for row in rows}
+        self.by_id = {row[0]: row for row in rows}
+
+    def get_id(self, slug):
+        row = self.by_slug.get(slug)
+        return None if row is None else row[0]
+
+    def get_ids(self, slugs):
+        return [
+            self.by_slug[slug][0] for slug in slugs if slug in self.by_slug
+        ]
+
+    def get_row(self, pk):
+        row = self.by_id.get(pk)
+        if row is not None:
+            return row
+        # created by a transaction that committed after our load
+        self.slugs.version = None
+        return self.slugs.load().by_id.get(pk)
+
+    def get_instance(self, pk):
+        model = self.slugs.model
+        return model.from_db(
+            router.db_for_read(model), self.slugs.fields, self.get_row(pk)
+        )
+
+    def serialize(self, pk):
+        '''The {name, slug} of Category/GenreSerializer'''
+        row = self.get_row(pk)
+        if row is None:
+            return None
+        return {'name': row[1], 'slug': row[2]}
+
+
+class SlugCache:
+    '''
+    Process-local slug -> id and id -> row maps of a small model,
+    reloaded when the shared version of its cache scope changes,
+    so every worker sees saves and deletes made by the others.
+    Each lookup checks the version, many lookups of one request
+    go to the maps returned by load()
+    '''
+    fields = ('id', 'name', 'slug')
+
+    def __init__(self, model, scope):
+        self.model = model
+        self.scope = scope
+        self.version = None
+        self.maps = SlugMaps(self, ())
+
+    def load(self):
+        version = get_versions([self.scope])[0]
+        if version != self.version:
+            rows = list(self.model.objects.values_list(*self.fields))
+            # swapped in whole, a concurrent reader sees old or new maps
+            self.maps = SlugMaps(self, rows)
+            self.version = version
+        return self.maps
+
+    def get_id(self, slug):
+        return self.load().get_id(slug)
+
+    def get_ids(self, slugs):
+        return self.load().get_ids(slugs)
+
+    def get_row(self, pk):
+        return self.load().get_row(pk)
+
+    def get_instance(self, pk):
+        return self.load().get_instance(pk)
+
+    def serialize(self, pk):
+        return self.load().serialize(pk)
+
+
+category_slugs = SlugCache(Category, 'categories')
+genre_slugs = SlugCache(Genre, 'genres')
@@ -1,8 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                    ReviewViewSet, Signup, TitleViewSet, Token, UserViewSet)
+from .views import (CategoryLeaderboardViewSet, CategoryViewSet,
+                    CommentExportViewSet, CommentSearchViewSet, CommentViewSet,
+                    GenreLeaderboardViewSet, GenreViewSet, ReviewExportViewSet,
+                    ReviewSearchViewSet, ReviewViewSet, Signup, TitleViewSet,
+                    Token, UserViewSet)
 
 router = SimpleRouter()
 router.register(r'categories', CategoryViewSet, basename='categories')
@@ -19,6 +22,26 @@ router.register(
     basename='comments'
 )
 router.register('users', UserViewSet, 'users')
+router.register(
+    r'search/reviews', ReviewSearchViewSet, basename='search-reviews'
+)
+router.register(
+    r'search/comments', CommentSearchViewSet, basename='search-comments'
+)
+router.register(
+    r'leaderboards/genres', GenreLeaderboardViewSet,
+    basename='leaderboards-genres'
+)
+router.register(
+    r'leaderboards/categories', CategoryLeaderboardViewSet,
+    basename='leaderboards-categories'
+)
+router.register(
+    r'export/reviews', ReviewExportViewSet, basename='export-reviews'
+)
+router.register(
+    r'export/comments', CommentExportViewSet, basename='export-comments'
+)
 
 urlpatterns = [
     path('v1/auth/signup/', Signup.as_view(), name='signup'),
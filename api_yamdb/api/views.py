@@ -1,33 +1,152 @@
+from functools import partial
+
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, generics, mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
-from reviews.models import Category, Genre, Review, Title, User
-
-from .filters import TitleFilter
+from reviews.models import (Category, Comment, Genre, LeaderboardEntry,
+                            OutboxEmail, Review, Title, TitleStats, User)
+
+from .cache import CachedListMixin, CachedReadMixin, invalidate
+from .exports import EXPORT_FORMATS, export_response
+from .filters import (CommentExportFilter, FullTextSearchFilter,
+                      ReviewExportFilter, TitleFilter, TitleOrderingFilter)
+from .pagination import ProjectPagination
+from .parsers import FastJSONParser, NDJSONParser
 from .permissions import AuthorModerAdminOrReadOnly, IsAdmin, ReadOnly
-from .serializers import (CategorySerializer, CommentSerializer,
-                          GenreSerializer, ReviewSerializer, SignupSerializer,
-                          TitleListSerializer, TitleSerializer,
-                          TokenSerializer, UserSerializer,
+from .serializers import (CategoryLeaderboardSerializer, CategorySerializer,
+                          CommentExportSerializer, CommentSearchSerializer,
+                          CommentSerializer, CommentValuesSerializer,
+                          GenreLeaderboardSerializer, GenreSerializer,
+                          ReviewExportSerializer, ReviewSearchSerializer,
+                          ReviewSerializer, ReviewValuesSerializer,
+                          SignupSerializer, TitleListSerializer,
+                          TitleSerializer, TitleStatsSerializer,
+                          TitleValuesSerializer, TokenSerializer,
+                          UserSerializer, UserValuesSerializer,
                           UserViewSetSerializer)
 
 
-class ProjectPagination(PageNumberPagination):
-    page_size = 10
+class ParentLookupMixin:
+    '''
+    Checks the parent of a nested route once per request,
+    the child rows are then filtered by the parent id from the url
+    '''
+    parent_model = None
+    # parent field -> url kwarg
+    parent_kwargs = {}
+
+    def get_parent_filter(self):
+        return {
+            field: self.kwargs.get(kwarg)
+            for field, kwarg in self.parent_kwargs.items()
+        }
+
+    def check_parent(self):
+        if getattr(self, '_parent_checked', False):
+            return
+        if not self.parent_model.objects.filter(
+            **self.get_parent_filter()
+        ).exists():
+            raise Http404
+        self._parent_checked = True
+
+
+class ValuesReadMixin:
+    '''
+    list and retrieve serialize values() rows with
+    `values_serializer_class` instead of model instances.
+    ?fields= keeps some of the fields, ?expand= embeds optional ones,
+    both by names separated with commas, only their columns are read
+    '''
+    values_serializer_class = None
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_query_names(self, param, allowed):
+        value = self.request.query_params.get(param, '')
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(names) - set(allowed)
+        if unknown:
+            raise ValidationError({
+                param: f'Неизвестные поля: {", ".join(sorted(unknown))}.'
+            })
+        return names
+
+    def get_values_serializer(self, *args, **kwargs):
+        serializer_class = self.values_serializer_class
+        context = self.get_serializer_context()
+        context['fields'] = self.get_query_names(
+            self.fields_query_param, serializer_class.field_names()
+        )
+        context['expand'] = self.get_query_names(
+            self.expand_query_param, serializer_class.expandable
+        )
+        kwargs['context'] = context
+        return serializer_class(*args, **kwargs)
+
+    def get_values_queryset(self):
+        # keyset cursors are built from the ordering columns
+        ordering = getattr(self, 'keyset_ordering', None) or ()
+        return self.get_values_serializer().project(
+            self.filter_queryset(self.get_queryset()),
+            [field.lstrip('-') for field in ordering],
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_values_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(
+                self.get_values_serializer(queryset, many=True).data
+            )
+        return self.get_paginated_response(
+            self.get_values_serializer(page, many=True).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        # a malformed pk is a missing object too
+        row = generics.get_object_or_404(
+            self.get_values_queryset(),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return Response(self.get_values_serializer(row).data)
+
+
+class ExportMixin:
+    '''
+    Every matching row as NDJSON or CSV (?output=csv) in one streamed
+    response, memory does not grow with the number of rows
+    '''
+    export_name = None
+    export_serializer_class = None
+
+    def export(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({
+                'output': f'Допустимые форматы: {", ".join(EXPORT_FORMATS)}.'
+            })
+        return export_response(
+            self.filter_queryset(self.get_queryset()),
+            self.export_serializer_class, output, self.export_name,
+        )
 
 
-class CategoryViewSet(mixins.ListModelMixin, mixins.CreateModelMixin,
-                      mixins.DestroyModelMixin, viewsets.GenericViewSet):
+class CategoryViewSet(CachedListMixin, mixins.ListModelMixin,
+                      mixins.CreateModelMixin, mixins.DestroyModelMixin,
+                      viewsets.GenericViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_scopes = ('categories',)
     lookup_field = 'slug'
     pagination_class = ProjectPagination
     filter_backends = (filters.SearchFilter,)
@@ -44,26 +163,156 @@ class CategoryViewSet(mixins.ListModelMixin, mixins.CreateModelMixin,
 class GenreViewSet(CategoryViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    cache_scopes = ('genres',)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.all()
+class TitleViewSet(CachedReadMixin, ValuesReadMixin, viewsets.ModelViewSet):
+    # rating is stored on Title and category and genre names come from
+    # the process caches, only the genre ids of the page are left to load
+    queryset = Title.objects.prefetch_related('genres_of_title')
     serializer_class = TitleListSerializer
     pagination_class = ProjectPagination
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (
+        DjangoFilterBackend, FullTextSearchFilter, TitleOrderingFilter
+    )
     filterset_class = TitleFilter
     permission_classes = (IsAdmin,)
+    values_serializer_class = TitleValuesSerializer
+    bulk_max_items = 1000
+
+    @property
+    def keyset_ordering(self):
+        # cursor pages follow ?ordering=
+        return TitleOrderingFilter().get_ordering(self.request) or ('id',)
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
             return TitleListSerializer
         return TitleSerializer
 
+    def get_cache_scopes(self):
+        # titles embed their category and genres
+        if self.action == 'stats':
+            return (f'title:{self.kwargs["pk"]}',)
+        if self.action == 'retrieve':
+            return (f'title:{self.kwargs["pk"]}', 'categories', 'genres')
+        return ('titles', 'categories', 'genres')
+
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'stats']:
             return (ReadOnly(),)
         return super().get_permissions()
 
+    def perform_update(self, serializer):
+        title = serializer.save()
+        # a new category or genre moves it between the boards
+        transaction.on_commit(
+            partial(LeaderboardEntry.refresh_for_title, title.id)
+        )
+
+    @action(
+        detail=False, methods=['post'],
+        parser_classes=(FastJSONParser, NDJSONParser),
+    )
+    def bulk(self, request):
+        '''
+        Create titles and update the ones with an `id` from a JSON list
+        or an NDJSON stream, valid items are saved in one transaction
+        with a few statements, the answer holds a result per item
+        '''
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'error': 'Ожидается список произведений.'})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({
+                'error': f'Не больше {self.bulk_max_items} произведений '
+                         'за запрос.',
+            })
+        instances = Title.objects.in_bulk([
+            item['id'] for item in items
+            if isinstance(item, dict) and isinstance(item.get('id'), int)
+        ])
+        results, valid = [], []
+        for index, item in enumerate(items):
+            try:
+                title, data = self.validate_bulk_item(item, instances)
+            except (ValidationError, NotFound) as error:
+                results.append({
+                    'index': index, 'status': error.status_code,
+                    'errors': error.detail,
+                })
+                continue
+            result = {'index': index, 'status': status.HTTP_200_OK}
+            if title is None:
+                result['status'] = status.HTTP_201_CREATED
+            results.append(result)
+            valid.append((result, title, data))
+        self.save_bulk(valid)
+        return Response(results)
+
+    def save_bulk(self, valid):
+        created, created_genres, created_results = [], [], []
+        changed, changed_fields, changed_genres = [], set(), {}
+        for result, title, data in valid:
+            genres = data.pop('genre', None)
+            if title is None:
+                created.append(Title(**data))
+                created_genres.append({genre.id for genre in genres})
+                created_results.append(result)
+                continue
+            result['id'] = title.id
+            for field, value in data.items():
+                setattr(title, field, value)
+            changed.append(title)
+            changed_fields.update(data)
+            if genres is not None:
+                changed_genres[title.id] = {genre.id for genre in genres}
+        with transaction.atomic():
+            Title.bulk_insert(created, created_genres)
+            Title.bulk_change(changed, changed_fields, changed_genres)
+            # bulk statements send no signals
+            invalidate('titles', 'search:titles', *(
+                f'title:{title.id}' for title in changed
+            ))
+            for title in changed:
+                transaction.on_commit(
+                    partial(LeaderboardEntry.refresh_for_title, title.id)
+                )
+        for result, title in zip(created_results, created):
+            result['id'] = title.id
+
+    def validate_bulk_item(self, item, instances):
+        if not isinstance(item, dict):
+            raise ValidationError({'error': 'Ожидается объект.'})
+        if 'id' in item and (
+            not isinstance(item['id'], int) or isinstance(item['id'], bool)
+        ):
+            raise ValidationError({'id': 'Ожидается целое число.'})
+        if 'id' in item and item['id'] not in instances:
+            raise NotFound({'id': 'Произведение не найдено.'})
+        title = instances.get(item.get('id'))
+        serializer = TitleSerializer(
+            title, data=item, partial=title is not None
+        )
+        serializer.is_valid(raise_exception=True)
+        return title, dict(serializer.validated_data)
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        return self.cached(self.get_stats, request, pk=pk)
+
+    def get_stats(self, request, pk=None):
+        try:
+            stats = TitleStats.objects.filter(title_id=pk).first()
+        except (TypeError, ValueError):
+            raise Http404
+        if stats is None:
+            # a title nobody reviewed yet has no stats row
+            if not Title.objects.filter(pk=pk).exists():
+                raise Http404
+            stats = TitleStats(title_id=pk)
+        return Response(TitleStatsSerializer(stats).data)
+
 
 class Signup(generics.CreateAPIView):
     serializer_class = SignupSerializer
@@ -86,12 +335,11 @@ class Signup(generics.CreateAPIView):
                 message = f'Код подтверждения: {confirmation_code}'
                 if user.email == serializer.data['email']:
                     usermail = user.email
-                    send_mail(
+                    OutboxEmail.enqueue(
                         'Код подтверждения',
                         message,
                         'from@example.com',
-                        [usermail],
-                        fail_silently=False,
+                        usermail,
                     )
                     raise ValidationError(
                         {'email': ['код отправлен повторно на email']}
@@ -102,23 +350,25 @@ class Signup(generics.CreateAPIView):
                     )
             raise ValidationError(serializer.errors)
 
-        self.perform_create(serializer)
+        # the user and the email with the code are saved together,
+        # the send_outbox worker delivers it
+        with transaction.atomic():
+            self.perform_create(serializer)
 
-        user = generics.get_object_or_404(
-            User,
-            username=serializer.validated_data['username']
-        )
-        confirmation_code = default_token_generator.make_token(user)
-        message = f'Код подтверждения: {confirmation_code}'
-        usermail = user.email
-
-        send_mail(
-            'Код подтверждения',
-            message,
-            'from@example.com',
-            [usermail],
-            fail_silently=False,
-        )
+            user = generics.get_object_or_404(
+                User,
+                username=serializer.validated_data['username']
+            )
+            confirmation_code = default_token_generator.make_token(user)
+            message = f'Код подтверждения: {confirmation_code}'
+            usermail = user.email
+
+            OutboxEmail.enqueue(
+                'Код подтверждения',
+                message,
+                'from@example.com',
+                usermail,
+            )
 
         headers = self.get_success_headers(serializer.data)
         return Response(
@@ -152,7 +402,7 @@ class Token(generics.GenericAPIView):
         )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ExportMixin, ValuesReadMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserViewSetSerializer
     pagination_class = ProjectPagination
@@ -160,6 +410,13 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAdmin,)
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username',)
+    export_name = 'users'
+    export_serializer_class = UserValuesSerializer
+    values_serializer_class = UserValuesSerializer
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_users(self, request):
+        return self.export(request)
 
     @action(detail=False,
             methods=['get', 'patch'],
@@ -177,18 +434,50 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer2.data)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(CachedReadMixin, ValuesReadMixin, ParentLookupMixin,
+                    viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
+    values_serializer_class = ReviewValuesSerializer
     permission_classes = (IsAdmin,)
     pagination_class = ProjectPagination
+    keyset_ordering = ('pub_date', 'id')
+    parent_model = Title
+    parent_kwargs = {'pk': 'title_id'}
+
+    def get_cache_scopes(self):
+        # reviews show the author username
+        return (f'reviews:{self.kwargs["title_id"]}', 'users')
 
     def get_queryset(self):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        return title.reviews.all()
+        # an empty list of a missing title must still be 404,
+        # single reviews are simply not found under a wrong title
+        if self.action == 'list':
+            self.check_parent()
+        queryset = Review.objects.filter(
+            title_id=self.kwargs.get('title_id')
+        ).select_related('author')
+        if self.action in ['update', 'partial_update', 'destroy']:
+            # the rating bookkeeping takes back the score read here,
+            # a concurrent write of the review waits for this one
+            return queryset.select_for_update(of=('self',))
+        return queryset
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, title=title)
+        self.check_parent()
+        # ratings, stats and leaderboards follow by the Review signals
+        with transaction.atomic():
+            serializer.save(
+                author=self.request.user,
+                title_id=int(self.kwargs.get('title_id')),
+            )
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -198,20 +487,33 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return (AuthorModerAdminOrReadOnly(),)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(CachedReadMixin, ValuesReadMixin, ParentLookupMixin,
+                     viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = (IsAdmin,)
     pagination_class = ProjectPagination
+    keyset_ordering = ('-pub_date', '-id')
+    parent_model = Review
+    parent_kwargs = {'pk': 'review_id', 'title_id': 'title_id'}
+
+    def get_cache_scopes(self):
+        return (f'comments:{self.kwargs["review_id"]}', 'users')
 
     def get_queryset(self):
-        review = get_object_or_404(Review, id=self.kwargs.get('review_id'),
-                                   title=self.kwargs.get('title_id'))
-        return review.comments.all()
+        if self.action == 'list':
+            self.check_parent()
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id'),
+        ).select_related('author')
 
     def perform_create(self, serializer):
-        review = get_object_or_404(Review, id=self.kwargs.get('review_id'),
-                                   title=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, review=review)
+        self.check_parent()
+        serializer.save(
+            author=self.request.user,
+            review_id=int(self.kwargs.get('review_id')),
+        )
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -219,3 +521,58 @@ class CommentViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return (IsAuthenticated(),)
         return (AuthorModerAdminOrReadOnly(),)
+
+
+class ReviewSearchViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    queryset = Review.objects.select_related('author')
+    serializer_class = ReviewSearchSerializer
+    pagination_class = ProjectPagination
+    filter_backends = (FullTextSearchFilter,)
+    search_required = True
+    permission_classes = (ReadOnly,)
+
+
+class CommentSearchViewSet(ReviewSearchViewSet):
+    queryset = Comment.objects.select_related('author', 'review')
+    serializer_class = CommentSearchSerializer
+
+
+class ReviewExportViewSet(ExportMixin, viewsets.GenericViewSet):
+    queryset = Review.objects.all()
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = ReviewExportFilter
+    permission_classes = (IsAdmin,)
+    export_name = 'reviews'
+    export_serializer_class = ReviewExportSerializer
+
+    def list(self, request, *args, **kwargs):
+        return self.export(request, *args, **kwargs)
+
+
+class CommentExportViewSet(ReviewExportViewSet):
+    queryset = Comment.objects.all()
+    filterset_class = CommentExportFilter
+    export_name = 'comments'
+    export_serializer_class = CommentExportSerializer
+
+
+class GenreLeaderboardViewSet(mixins.ListModelMixin,
+                              mixins.RetrieveModelMixin,
+                              viewsets.GenericViewSet):
+    '''Precomputed best rated titles, a board is read in one query'''
+    queryset = Genre.objects.prefetch_related(Prefetch(
+        'leaderboard',
+        queryset=LeaderboardEntry.objects.select_related('title'),
+    ))
+    serializer_class = GenreLeaderboardSerializer
+    lookup_field = 'slug'
+    pagination_class = ProjectPagination
+    permission_classes = (ReadOnly,)
+
+
+class CategoryLeaderboardViewSet(GenreLeaderboardViewSet):
+    queryset = Category.objects.prefetch_related(Prefetch(
+        'leaderboard',
+        queryset=LeaderboardEntry.objects.select_related('title'),
+    ))
+    serializer_class = CategoryLeaderboardSerializer
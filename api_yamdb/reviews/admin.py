@@ -1,11 +1,29 @@
 from django.contrib import admin
 
-from .models import Category, Comment, Genre, GenreTitle, Review, Title, User
+from .models import (Category, Comment, Genre, GenreTitle, OutboxEmail, Review,
+                     Title, User)
 
 
-@admin.register(User, Category, Genre, GenreTitle, Title, Review, Comment)
+@admin.register(User, Category, Genre, Comment, OutboxEmail)
 class ProjectModelsAdmin(admin.ModelAdmin):
 
     list_display = ('id', '__str__',)
 
     empty_value_display = "-пусто-"
+    # one COUNT(*) of the filtered rows per page instead of two
+    show_full_result_count = False
+
+
+@admin.register(GenreTitle)
+class GenreTitleAdmin(ProjectModelsAdmin):
+    list_select_related = ('title', 'genre')
+
+
+@admin.register(Title)
+class TitleAdmin(ProjectModelsAdmin):
+    list_select_related = ('category',)
+
+
+@admin.register(Review)
+class ReviewAdmin(ProjectModelsAdmin):
+    list_select_related = ('author', 'title')
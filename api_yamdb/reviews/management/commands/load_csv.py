@@ -0,0 +1,447 @@
+import csv
+import multiprocessing
+import os
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+
+import django
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+from reviews.models import (Category, Comment, Genre, GenreTitle,
+                            LeaderboardEntry, Review, Title, TitleStats, User)
+
+# csv column -> model field, foreign keys are written by id
+CsvFile = namedtuple('CsvFile', 'name model columns')
+
+CSV_FILES = (
+    CsvFile('category.csv', Category, {
+        'id': 'id', 'name': 'name', 'slug': 'slug',
+    }),
+    CsvFile('titles.csv', Title, {
+        'id': 'id', 'name': 'name', 'year': 'year', 'category': 'category',
+    }),
+    CsvFile('users.csv', User, {
+        'id': 'id', 'username': 'username', 'email': 'email',
+        'role': 'role', 'bio': 'bio', 'first_name': 'first_name',
+        'last_name': 'last_name',
+    }),
+    CsvFile('genre.csv', Genre, {
+        'id': 'id', 'name': 'name', 'slug': 'slug',
+    }),
+    CsvFile('genre_title.csv', GenreTitle, {
+        'id': 'id', 'title_id': 'title', 'genre_id': 'genre',
+    }),
+    CsvFile('review.csv', Review, {
+        'id': 'id', 'title_id': 'title', 'text': 'text', 'author': 'author',
+        'score': 'score', 'pub_date': 'pub_date',
+    }),
+    CsvFile('comments.csv', Comment, {
+        'id': 'id', 'review_id': 'review', 'text': 'text',
+        'author': 'author', 'pub_date': 'pub_date',
+    }),
+)
+CSV_FILES_BY_NAME = {csv_file.name: csv_file for csv_file in CSV_FILES}
+
+LOAD_ERRORS = (OSError, KeyError, ValidationError, DatabaseError)
+
+# smaller files are not worth splitting between workers
+SHARD_MIN_ROWS = 10000
+
+# one piece of work for a worker: rows [start, stop) of a file
+LoadTask = namedtuple('LoadTask', 'name directory start stop options')
+LoadResult = namedtuple('LoadResult', 'name start rows seconds error')
+
+
+def get_converters(csv_file):
+    converters = []
+    for column, name in csv_file.columns.items():
+        field = csv_file.model._meta.get_field(name)
+        converters.append((column, field.attname, field))
+    return converters
+
+
+def convert(field, value):
+    if value == '' and field.null:
+        return None
+    return field.to_python(value)
+
+
+def read_chunks(reader, size):
+    while True:
+        chunk = list(islice(reader, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RowStream:
+    '''File-like reader over csv rows, feeds COPY FROM STDIN lazily'''
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = ''
+        self.count = 0
+        self.writer = csv.writer(self)
+
+    def write(self, line):
+        self.buffer += line
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                self.writer.writerow(next(self.rows))
+            except StopIteration:
+                break
+            self.count += 1
+        data = self.buffer if size < 0 else self.buffer[:size]
+        self.buffer = self.buffer[len(data):]
+        return data
+
+
+def get_copy_layout(csv_file):
+    '''
+    Table columns for COPY: the mapped csv columns, then the fields
+    absent from the file with their python defaults as constants
+    '''
+    model = csv_file.model
+    mapped = {}
+    for column, name in csv_file.columns.items():
+        mapped[model._meta.get_field(name).column] = column
+    constants = {}
+    for field in model._meta.concrete_fields:
+        if field.column in mapped:
+            continue
+        if field.null and not field.has_default():
+            continue
+        value = field.get_db_prep_save(field.get_default(), connection)
+        constants[field.column] = '' if value is None else str(value)
+    not_null = [
+        field.column for field in model._meta.concrete_fields
+        if not field.null and (field.column in mapped
+                               or field.column in constants)
+    ]
+    return mapped, constants, not_null
+
+
+def copy_sql(table, columns, not_null):
+    quote = connection.ops.quote_name
+    sql = (
+        f'COPY {quote(table)} ({", ".join(map(quote, columns))}) '
+        'FROM STDIN WITH (FORMAT csv'
+    )
+    if not_null:
+        sql += f', FORCE_NOT_NULL ({", ".join(map(quote, not_null))})'
+    return sql + ')'
+
+
+def get_index_definitions(table):
+    '''Secondary indexes of the table, the ones not backing constraints'''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE tablename = %s AND indexname NOT IN ('
+            '  SELECT conname FROM pg_constraint '
+            '  WHERE conrelid = %s::regclass)',
+            [table, connection.ops.quote_name(table)],
+        )
+        return cursor.fetchall()
+
+
+def drop_indexes(indexes):
+    with connection.cursor() as cursor:
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+
+
+def create_indexes(indexes):
+    with connection.cursor() as cursor:
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+
+@contextmanager
+def deferred_indexes(tables):
+    '''
+    Drop the secondary indexes of the tables for the load
+    and build them once afterwards
+    '''
+    indexes = []
+    for table in tables:
+        indexes += get_index_definitions(table)
+    drop_indexes(indexes)
+    try:
+        yield
+    finally:
+        create_indexes(indexes)
+
+
+@contextmanager
+def keep_dates(model):
+    '''Let auto_now_add fields keep the dates from the file'''
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def read_rows(csv_file, directory, start=0, stop=None):
+    '''Rows [start, stop) of the file, the header must have every column'''
+    link = os.path.join(directory, csv_file.name)
+    with open(link, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        missing = set(csv_file.columns) - set(reader.fieldnames or ())
+        if missing:
+            raise KeyError(', '.join(sorted(missing)))
+        yield islice(reader, start, stop)
+
+
+def count_rows(csv_file, directory):
+    with read_rows(csv_file, directory) as rows:
+        return sum(1 for _ in rows)
+
+
+def orm_load(csv_file, rows, batch_size):
+    converters = get_converters(csv_file)
+    count = 0
+    with transaction.atomic(), keep_dates(csv_file.model):
+        for chunk in read_chunks(rows, batch_size):
+            csv_file.model.objects.bulk_create(
+                csv_file.model(**{
+                    attname: convert(field, row[column])
+                    for column, attname, field in converters
+                })
+                for row in chunk
+            )
+            count += len(chunk)
+    return count
+
+
+def copy_load(csv_file, rows, defer_indexes=False):
+    table = csv_file.model._meta.db_table
+    mapped, constants, not_null = get_copy_layout(csv_file)
+    stream = RowStream(
+        [row[column] for column in mapped.values()]
+        + list(constants.values())
+        for row in rows
+    )
+    with transaction.atomic(), ExitStack() as stack:
+        if defer_indexes:
+            stack.enter_context(deferred_indexes([table]))
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                copy_sql(table, list(mapped) + list(constants), not_null),
+                stream,
+            )
+    return stream.count
+
+
+def load_part(task):
+    '''Load one file or one row range of it, errors are returned'''
+    csv_file = CSV_FILES_BY_NAME[task.name]
+    options = task.options
+    started = time.monotonic()
+    try:
+        with read_rows(csv_file, task.directory,
+                       task.start, task.stop) as rows:
+            if options['fast']:
+                count = copy_load(csv_file, rows, options['defer_indexes'])
+            else:
+                count = orm_load(csv_file, rows, options['batch_size'])
+    except LOAD_ERRORS as e:
+        return LoadResult(task.name, task.start, 0,
+                          time.monotonic() - started, str(e))
+    return LoadResult(task.name, task.start, count,
+                      time.monotonic() - started, None)
+
+
+def worker_pool(workers):
+    '''
+    Spawned, not forked, processes: no connection is shared with them.
+    Each one sets django up before a task, whose unpickling imports
+    this module and so the models
+    '''
+    return ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def get_stages(csv_files):
+    '''
+    Group the files by their foreign keys: every file comes in a stage
+    after the files of the models it points to
+    '''
+    models = {csv_file.model: csv_file for csv_file in csv_files}
+    depends = {
+        csv_file.name: {
+            models[field.related_model].name
+            for field in csv_file.model._meta.concrete_fields
+            if field.is_relation and field.related_model in models
+            and field.related_model is not csv_file.model
+        }
+        for csv_file in csv_files
+    }
+    stages = []
+    done = set()
+    while len(done) < len(csv_files):
+        stage = [
+            csv_file for csv_file in csv_files
+            if csv_file.name not in done and depends[csv_file.name] <= done
+        ]
+        if not stage:
+            raise ValueError('Foreign keys of the csv files form a cycle')
+        stages.append(stage)
+        done.update(csv_file.name for csv_file in stage)
+    return stages
+
+
+def split_rows(total, parts):
+    '''[start, stop) ranges of nearly equal size covering `total` rows'''
+    size = -(-total // parts)
+    return [(start, min(start + size, total))
+            for start in range(0, total, size)]
+
+
+class Command(BaseCommand):
+    help = 'Load data from directory with specific csv files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=str)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows read and inserted at once',
+        )
+        parser.add_argument(
+            '--fast', action='store_true',
+            help='Stream the files with COPY FROM STDIN (PostgreSQL only)',
+        )
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='With --fast, build secondary indexes once after the load',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes loading independent files and row ranges '
+                 'at once (PostgreSQL only)',
+        )
+
+    def handle(self, directory: str, *args, **options):
+        if connection.vendor != 'postgresql':
+            if options['fast']:
+                self.stdout.write(self.style.WARNING(
+                    f'COPY is not available on {connection.vendor}, '
+                    'loading through the ORM'
+                ))
+            if options['workers'] > 1:
+                self.stdout.write(self.style.WARNING(
+                    f'{connection.vendor} takes one writer at a time, '
+                    'loading in one process'
+                ))
+            options.update(fast=False, workers=1)
+        load_options = {
+            key: options[key]
+            for key in ('batch_size', 'fast', 'defer_indexes')
+        }
+
+        started = time.monotonic()
+        with ExitStack() as stack:
+            pool = None
+            if options['workers'] > 1:
+                pool = stack.enter_context(worker_pool(options['workers']))
+            for number, stage in enumerate(get_stages(CSV_FILES), 1):
+                stage_started = time.monotonic()
+                self.run_stage(stage, directory, load_options, pool,
+                               options['workers'])
+                self.stdout.write(
+                    f'Stage {number} '
+                    f'({", ".join(csv_file.name for csv_file in stage)}): '
+                    f'{time.monotonic() - stage_started:.1f}s'
+                )
+        self.finish([csv_file.model for csv_file in CSV_FILES])
+        self.stdout.write(f'Total: {time.monotonic() - started:.1f}s')
+
+    def run_stage(self, stage, directory, options, pool, workers):
+        if pool is None:
+            for csv_file in stage:
+                self.report([load_part(
+                    LoadTask(csv_file.name, directory, 0, None, options)
+                )])
+            return
+
+        tasks = []
+        for csv_file in stage:
+            tasks += self.split(csv_file, directory, options, workers)
+        with ExitStack() as stack:
+            if options['fast'] and options['defer_indexes']:
+                # shards share the tables, indexes are rebuilt per stage
+                stack.enter_context(deferred_indexes(
+                    [csv_file.model._meta.db_table for csv_file in stage]
+                ))
+                options = dict(options, defer_indexes=False)
+                tasks = [task._replace(options=options) for task in tasks]
+            results = defaultdict(list)
+            for result in pool.map(load_part, tasks):
+                results[result.name].append(result)
+        for csv_file in stage:
+            self.report(results[csv_file.name])
+
+    def split(self, csv_file, directory, options, workers):
+        try:
+            total = count_rows(csv_file, directory)
+        except LOAD_ERRORS:
+            # the worker reports it
+            total = 0
+        if total < SHARD_MIN_ROWS:
+            return [LoadTask(csv_file.name, directory, 0, None, options)]
+        return [
+            LoadTask(csv_file.name, directory, start, stop, options)
+            for start, stop in split_rows(total, workers)
+        ]
+
+    def report(self, results):
+        name = results[0].name
+        rows = sum(result.rows for result in results)
+        # shards run at the same time
+        seconds = max(result.seconds for result in results)
+        for result in results:
+            if result.error is None:
+                continue
+            shard = f' (rows from {result.start})' if len(results) > 1 else ''
+            self.stdout.write(
+                self.style.ERROR(
+                    f'Error while importing data form {name}{shard}: '
+                    f'{result.error}'
+                )
+            )
+        if all(result.error is None for result in results):
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Successfully load {name}: {rows} rows in '
+                    f'{seconds:.1f}s ({rows / max(seconds, 1e-6):.0f} rows/s)'
+                )
+            )
+
+    def finish(self, models):
+        '''Bring the database in line with the rows loaded past the ORM'''
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        Title.rebuild_ratings()
+        TitleStats.rebuild()
+        LeaderboardEntry.rebuild()
+        # the loaded rows sent no signals to invalidate the api responses
+        cache.clear()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from reviews.models import Title, TitleStats
+
+
+class Command(BaseCommand):
+    help = 'Recalculate stored title ratings and stats from the reviews table'
+
+    def handle(self, *args, **options):
+        updated = Title.rebuild_ratings()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {updated} ratings')
+        )
+        updated = TitleStats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {updated} title stats')
+        )
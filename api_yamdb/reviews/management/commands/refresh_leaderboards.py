@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from reviews.models import LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the best rated titles of every genre and category'
+
+    def handle(self, *args, **options):
+        refreshed = LeaderboardEntry.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully refreshed {refreshed} boards')
+        )
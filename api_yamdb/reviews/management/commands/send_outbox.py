@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reviews.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = 'Send the queued emails, in a loop until stopped or just once'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Send what is due and exit',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE,
+            help='Emails sent over one connection',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait when nothing is due',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = OutboxEmail.send_batch(options['batch_size'])
+            except Exception as error:
+                if options['once']:
+                    raise
+                # e.g. the database is away, the worker waits it out
+                self.stderr.write(f'{type(error).__name__}: {error}')
+                time.sleep(options['interval'])
+                continue
+            if sent or failed:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Sent {sent} emails, {failed} failed')
+                )
+            if options['once'] and sent + failed < options['batch_size']:
+                return
+            if not sent + failed:
+                time.sleep(options['interval'])
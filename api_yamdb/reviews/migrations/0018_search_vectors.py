@@ -0,0 +1,79 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:47
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# table -> weighted source columns of its search_vector
+SEARCH_SOURCES = {
+    'reviews_title': (('name', 'A'), ('description', 'B')),
+    'reviews_review': (('text', 'A'),),
+    'reviews_comment': (('text', 'A'),),
+}
+
+
+def vector_sql(columns, row=''):
+    return ' || '.join(
+        f"setweight(to_tsvector('pg_catalog.simple', "
+        f"coalesce({row}{column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+
+
+def create_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in SEARCH_SOURCES.items():
+        names = ', '.join(column for column, _ in columns)
+        schema_editor.execute(f'''
+            CREATE FUNCTION {table}_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {vector_sql(columns, 'NEW.')};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER {table}_search_vector_update
+                BEFORE INSERT OR UPDATE OF {names} ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE {table}_search_vector();
+            UPDATE {table} SET search_vector = {vector_sql(columns)};
+            CREATE INDEX {table}_search_idx ON {table}
+                USING gin (search_vector);
+        ''')
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_SOURCES:
+        schema_editor.execute(f'''
+            DROP INDEX {table}_search_idx;
+            DROP TRIGGER {table}_search_vector_update ON {table};
+            DROP FUNCTION {table}_search_vector();
+        ''')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0017_keyset_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# table -> columns searched by substring (icontains compares UPPER(column))
+TRIGRAM_COLUMNS = {
+    'reviews_title': ('name',),
+    'reviews_category': ('name',),
+    'reviews_genre': ('name',),
+    'reviews_user': ('username',),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            schema_editor.execute(
+                f'CREATE INDEX {table}_{column}_trgm_idx ON {table} '
+                f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            schema_editor.execute(f'DROP INDEX {table}_{column}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0018_search_vectors'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,10 +1,16 @@
-from datetime import datetime
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage, get_connection
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -104,15 +110,18 @@ class Genre(models.Model):
 
 
 class GenreTitle(models.Model):
+    # both columns lead a composite index below, no single ones needed
     title = models.ForeignKey(
         'Title',
         on_delete=models.CASCADE,
         related_name='genres_of_title',
+        db_index=False,
     )
     genre = models.ForeignKey(
         Genre,
         on_delete=models.CASCADE,
         related_name='titles_by_genre',
+        db_index=False,
     )
 
     class Meta():
@@ -123,6 +132,11 @@ class GenreTitle(models.Model):
                 name='unique_title_genre'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['genre', 'title'], name='genretitle_genre_title_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title.name + ' - ' + self.genre.slug
@@ -136,8 +150,16 @@ class Title(models.Model):
         Category,
         on_delete=models.SET_NULL,
         null=True,
-        related_name='titles')
+        related_name='titles',
+        db_index=False)
     genre = models.ManyToManyField(Genre, through=GenreTitle)
+    # denormalized review scores, kept in sync by reviews.signals
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # rating_sum / rating_count stored for ordering, 0 without reviews
+    rating_avg = models.FloatField(default=0)
+    # filled by a postgres trigger from name and description
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta():
         constraints = [
@@ -146,6 +168,22 @@ class Title(models.Model):
                 name='A year is valid this year plus 10',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['category', 'id'], name='title_category_id_idx',
+            ),
+            # the orderings of the title list, id breaks the ties
+            models.Index(fields=['rating_avg', 'id'], name='title_rating_idx'),
+            models.Index(
+                fields=['category', 'rating_avg', 'id'],
+                name='title_category_rating_idx',
+            ),
+            models.Index(
+                fields=['rating_count', 'id'], name='title_reviews_count_idx',
+            ),
+            models.Index(fields=['year', 'id'], name='title_year_idx'),
+            models.Index(fields=['name', 'id'], name='title_name_idx'),
+        ]
         ordering = ('id',)
 
     def __str__(self):
@@ -153,13 +191,109 @@ class Title(models.Model):
             f'{self.name} ({self.year}) - {self.category.name} - {self.genre}'
         )
 
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        if created:
+            TitleStats.objects.create(title=self)
+
+    @classmethod
+    def bulk_insert(cls, titles, genres):
+        '''
+        Insert titles with their genre links in a few statements,
+        `genres` holds the genre ids of every title
+        '''
+        with transaction.atomic():
+            if connection.features.can_return_ids_from_bulk_insert:
+                cls.objects.bulk_create(titles, batch_size=1000)
+            else:
+                # the ids are needed for the links, the stats rows
+                # are inserted below for all titles at once
+                for title in titles:
+                    super(Title, title).save()
+            TitleStats.objects.bulk_create(
+                (TitleStats(title=title) for title in titles),
+                batch_size=1000,
+            )
+            GenreTitle.objects.bulk_create(
+                (
+                    GenreTitle(title=title, genre_id=genre_id)
+                    for title, genre_ids in zip(titles, genres)
+                    for genre_id in genre_ids
+                ),
+                batch_size=1000,
+            )
+        return titles
+
+    @classmethod
+    def bulk_change(cls, titles, fields, genres):
+        '''
+        Save `fields` of the titles with one UPDATE per batch, `genres`
+        maps the ids of titles with new genres to their genre ids
+        '''
+        with transaction.atomic():
+            if fields:
+                cls.objects.bulk_update(titles, fields, batch_size=1000)
+            if genres:
+                GenreTitle.objects.filter(title_id__in=genres).delete()
+                GenreTitle.objects.bulk_create(
+                    (
+                        GenreTitle(title_id=title_id, genre_id=genre_id)
+                        for title_id, genre_ids in genres.items()
+                        for genre_id in genre_ids
+                    ),
+                    batch_size=1000,
+                )
+        return titles
+
     @property
     def rating(self):
-        output = self.reviews.aggregate(models.Avg('score')).get('score__avg')
-        if output:
-            return round(output, 1)
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 1)
         return None
 
+    @staticmethod
+    def average_after(score_delta, count_delta):
+        '''SQL for the average of an UPDATE shifting the sum and count'''
+        return models.Case(
+            models.When(rating_count=-count_delta, then=models.Value(0.0)),
+            default=Cast(
+                models.F('rating_sum') + score_delta, models.FloatField()
+            ) / (models.F('rating_count') + count_delta),
+            output_field=models.FloatField(),
+        )
+
+    @classmethod
+    def change_rating(cls, title_id, score_delta, count_delta=0):
+        '''Shift the stored score sum and count of a title in one UPDATE'''
+        cls.objects.filter(pk=title_id).update(
+            rating_sum=models.F('rating_sum') + score_delta,
+            rating_count=models.F('rating_count') + count_delta,
+            rating_avg=cls.average_after(score_delta, count_delta),
+        )
+
+    @classmethod
+    def rebuild_ratings(cls, queryset=None):
+        '''Recalculate the stored ratings from the reviews table'''
+        if queryset is None:
+            queryset = cls.objects.all()
+        reviews = Review.objects.filter(
+            title=models.OuterRef('pk')
+        ).order_by().values('title')
+        return queryset.update(
+            rating_sum=Coalesce(models.Subquery(
+                reviews.annotate(total=models.Sum('score')).values('total')
+            ), 0),
+            rating_count=Coalesce(models.Subquery(
+                reviews.annotate(total=models.Count('id')).values('total')
+            ), 0),
+            rating_avg=Coalesce(models.Subquery(
+                reviews.annotate(average=models.Avg(
+                    'score', output_field=models.FloatField()
+                )).values('average')
+            ), 0.0),
+        )
+
 
 def no_future_date(value):
     today = datetime.today()
@@ -171,14 +305,18 @@ def no_future_date(value):
 class Review(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='reviews', null=True)
+    # served by review_title_pub_date_idx
     title = models.ForeignKey(
-        Title, on_delete=models.CASCADE, related_name='reviews', null=True)
+        Title, on_delete=models.CASCADE, related_name='reviews', null=True,
+        db_index=False)
     text = models.TextField()
     pub_date = models.DateTimeField(
         'review_pub_date', auto_now_add=True, db_index=True,
         validators=[no_future_date]
     )
     score = models.PositiveSmallIntegerField(default=0)
+    # filled by a postgres trigger from text
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         constraints = [
@@ -191,6 +329,12 @@ class Review(models.Model):
                 name='unique_title_author'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['title', 'pub_date', 'id'],
+                name='review_title_pub_date_idx',
+            ),
+        ]
         ordering = ('pub_date',)
 
     def __str__(self):
@@ -201,20 +345,381 @@ class Review(models.Model):
             f'{self.text}'
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        # what the rating bookkeeping takes back when the review changes
+        review.stored = (
+            review.__dict__.get('title_id'), review.__dict__.get('score')
+        )
+        return review
+
 
 class Comment(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='comments')
+    # served by comment_review_pub_date_idx
     review = models.ForeignKey(
-        Review, on_delete=models.CASCADE, related_name='comments'
+        Review, on_delete=models.CASCADE, related_name='comments',
+        db_index=False
     )
     text = models.TextField()
     pub_date = models.DateTimeField(
         'comment_pub_date', auto_now_add=True, db_index=True
     )
+    # filled by a postgres trigger from text
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta():
+        indexes = [
+            models.Index(
+                fields=['review', 'pub_date', 'id'],
+                name='comment_review_pub_date_idx',
+            ),
+        ]
         ordering = ('-pub_date',)
 
     def __str__(self):
         return self.text
+
+
+class TitleStats(models.Model):
+    '''
+    Review count per score of a title, kept in sync by reviews.signals
+    so the distribution is one row instead of a scan of the reviews
+    '''
+    SCORES = range(11)
+
+    title = models.OneToOneField(
+        Title, on_delete=models.CASCADE, primary_key=True,
+        related_name='stats',
+    )
+    score_0 = models.PositiveIntegerField(default=0)
+    score_1 = models.PositiveIntegerField(default=0)
+    score_2 = models.PositiveIntegerField(default=0)
+    score_3 = models.PositiveIntegerField(default=0)
+    score_4 = models.PositiveIntegerField(default=0)
+    score_5 = models.PositiveIntegerField(default=0)
+    score_6 = models.PositiveIntegerField(default=0)
+    score_7 = models.PositiveIntegerField(default=0)
+    score_8 = models.PositiveIntegerField(default=0)
+    score_9 = models.PositiveIntegerField(default=0)
+    score_10 = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    last_review_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f'{self.title_id}: {self.total}'
+
+    @property
+    def scores(self):
+        return {
+            score: getattr(self, f'score_{score}') for score in self.SCORES
+        }
+
+    @classmethod
+    def record(cls, title_id, added=None, removed=None, reviewed_at=None):
+        '''
+        Move one review between the score buckets of a title in one UPDATE,
+        a title without stats yet gets them built from its reviews
+        '''
+        changes = Counter()
+        if added is not None:
+            changes[added] += 1
+        if removed is not None:
+            changes[removed] -= 1
+        values = {
+            f'score_{score}': models.F(f'score_{score}') + delta
+            for score, delta in changes.items() if delta
+        }
+        total = sum(changes.values())
+        if total:
+            values['total'] = models.F('total') + total
+        if reviewed_at is not None:
+            values['last_review_at'] = reviewed_at
+        elif added is None:
+            # the deleted review may have been the latest one
+            values['last_review_at'] = models.Subquery(
+                Review.objects.filter(title_id=title_id).order_by(
+                    '-pub_date'
+                ).values('pub_date')[:1]
+            )
+        if not values or cls.objects.filter(pk=title_id).update(**values):
+            return
+        if added is None:
+            # only a title being deleted has no stats row,
+            # its reviews are deleted with it
+            return
+        try:
+            with transaction.atomic():
+                cls.rebuild(Title.objects.filter(pk=title_id))
+        except IntegrityError:
+            # a concurrent review has just created the row
+            cls.objects.filter(pk=title_id).update(**values)
+
+    @classmethod
+    def rebuild(cls, titles=None):
+        '''Recalculate the stats of the titles from the reviews table'''
+        reviews = Review.objects.filter(title__isnull=False).order_by()
+        stats = cls.objects.all()
+        if titles is not None:
+            reviews = reviews.filter(title__in=titles)
+            stats = stats.filter(title__in=titles)
+        rows = {}
+        for title_id, score, count, last in reviews.values_list(
+            'title_id', 'score'
+        ).annotate(
+            count=models.Count('id'), last=models.Max('pub_date')
+        ).iterator():
+            row = rows.setdefault(title_id, cls(title_id=title_id))
+            setattr(row, f'score_{score}', count)
+            row.total += count
+            if row.last_review_at is None or last > row.last_review_at:
+                row.last_review_at = last
+        stats.delete()
+        cls.objects.bulk_create(rows.values(), batch_size=1000)
+        return len(rows)
+
+
+class LeaderboardEntry(models.Model):
+    '''
+    A place among the best rated titles of a genre or a category,
+    boards are rebuilt from the indexed Title.rating_avg
+    '''
+    GROUPS = ('genre', 'category')
+
+    # lead the unique (group, position) indexes below
+    genre = models.ForeignKey(
+        Genre, on_delete=models.CASCADE, null=True, db_index=False,
+        related_name='leaderboard',
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, db_index=False,
+        related_name='leaderboard',
+    )
+    position = models.PositiveSmallIntegerField()
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='+'
+    )
+    rating = models.FloatField()
+    reviews_count = models.PositiveIntegerField()
+
+    class Meta():
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(genre__isnull=False, category__isnull=True)
+                    | models.Q(genre__isnull=True, category__isnull=False)
+                ),
+                name='leaderboard_has_one_group',
+            ),
+            models.UniqueConstraint(
+                fields=['genre', 'position'], name='unique_genre_position'
+            ),
+            models.UniqueConstraint(
+                fields=['category', 'position'],
+                name='unique_category_position',
+            ),
+        ]
+        ordering = ('position',)
+
+    def __str__(self):
+        return f'{self.genre_id or self.category_id}: {self.position}'
+
+    @classmethod
+    def top_titles(cls, group, group_id):
+        return Title.objects.filter(
+            **{group: group_id},
+            rating_count__gte=settings.LEADERBOARD_MIN_REVIEWS,
+        ).order_by('-rating_avg', '-id').values_list(
+            'id', 'rating_avg', 'rating_count'
+        )[:settings.LEADERBOARD_SIZE]
+
+    @classmethod
+    def refresh(cls, group, group_id):
+        '''Rebuild one board, a lock on the group keeps refreshes apart'''
+        model = cls._meta.get_field(group).related_model
+        with transaction.atomic():
+            if not list(model.objects.select_for_update().filter(
+                pk=group_id
+            ).values_list('pk', flat=True)):
+                return
+            cls.objects.filter(**{group: group_id}).delete()
+            cls.objects.bulk_create(
+                cls(
+                    position=position, title_id=title_id, rating=rating,
+                    reviews_count=count, **{f'{group}_id': group_id},
+                )
+                for position, (title_id, rating, count) in enumerate(
+                    cls.top_titles(group, group_id), 1
+                )
+            )
+
+    @classmethod
+    def refresh_for_title(cls, title_id):
+        '''
+        Rebuild the boards the title is on or has just earned a place on,
+        the others can not change with its rating
+        '''
+        title = Title.objects.filter(pk=title_id).values(
+            'category_id', 'rating_avg', 'rating_count'
+        ).first()
+        if title is None:
+            return 0
+        groups = {
+            ('genre', genre_id) for genre_id in GenreTitle.objects.filter(
+                title_id=title_id
+            ).values_list('genre_id', flat=True)
+        }
+        if title['category_id'] is not None:
+            groups.add(('category', title['category_id']))
+        nearby = models.Q(title_id=title_id) | models.Q(
+            genre_id__in=[pk for group, pk in groups if group == 'genre']
+        )
+        if title['category_id'] is not None:
+            nearby |= models.Q(category_id=title['category_id'])
+        boards = defaultdict(list)
+        for entry in cls.objects.filter(nearby).values(
+            'genre_id', 'category_id', 'title_id', 'rating'
+        ):
+            group = 'genre' if entry['genre_id'] else 'category'
+            boards[(group, entry[f'{group}_id'])].append(
+                (entry['rating'], entry['title_id'])
+            )
+        # boards it has left with a change of its category or genres
+        groups.update(
+            key for key, entries in boards.items()
+            if any(entry_id == title_id for _, entry_id in entries)
+        )
+        qualifies = title['rating_count'] >= settings.LEADERBOARD_MIN_REVIEWS
+        refreshed = 0
+        # always in the same order, so concurrent refreshes can not deadlock
+        for key in sorted(groups):
+            entries = boards[key]
+            if any(entry_id == title_id for _, entry_id in entries):
+                changed = True
+            elif not qualifies:
+                changed = False
+            elif len(entries) < settings.LEADERBOARD_SIZE:
+                changed = True
+            else:
+                changed = (title['rating_avg'], title_id) > min(entries)
+            if changed:
+                cls.refresh(*key)
+                refreshed += 1
+        return refreshed
+
+    @classmethod
+    def rebuild(cls):
+        '''Rebuild the boards of every genre and category'''
+        refreshed = 0
+        for group in cls.GROUPS:
+            model = cls._meta.get_field(group).related_model
+            for group_id in model.objects.values_list('pk', flat=True):
+                cls.refresh(group, group_id)
+                refreshed += 1
+        return refreshed
+
+
+class OutboxEmail(models.Model):
+    '''
+    Email to be sent by the send_outbox worker, written in the
+    transaction of the request, so it is sent only if that commits
+    '''
+    subject = models.CharField(max_length=256)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.EmailField(max_length=254)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # the next attempt is not made before
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # only the pending emails, in the order they are sent
+            models.Index(
+                fields=['send_after'], name='outbox_pending_idx',
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.to}: {self.subject}'
+
+    @classmethod
+    def enqueue(cls, subject, body, from_email, to):
+        return cls.objects.create(
+            subject=subject, body=body, from_email=from_email, to=to
+        )
+
+    @staticmethod
+    def retry_delay(attempts):
+        '''Exponential backoff after the given number of failures'''
+        delay = settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+        return timedelta(seconds=min(delay, settings.OUTBOX_MAX_RETRY_DELAY))
+
+    def fail(self, error):
+        '''Count a failed attempt and put the next one off'''
+        self.attempts += 1
+        self.last_error = f'{type(error).__name__}: {error}'
+        self.send_after = timezone.now() + self.retry_delay(self.attempts)
+
+    @classmethod
+    def send_batch(cls, size=None):
+        '''
+        Send the due emails over one connection of EMAIL_BACKEND,
+        rows being sent are locked, so workers take different batches.
+        Returns the numbers of sent and failed emails
+        '''
+        size = size or settings.OUTBOX_BATCH_SIZE
+        with transaction.atomic():
+            emails = list(cls.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                sent_at__isnull=True, send_after__lte=timezone.now(),
+                attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+            ).order_by('send_after')[:size])
+            if not emails:
+                return 0, 0
+            sent, failed = cls.send_over(get_connection(), emails)
+            cls.objects.bulk_update(sent, ['sent_at'])
+            cls.objects.bulk_update(
+                failed, ['attempts', 'last_error', 'send_after']
+            )
+        return len(sent), len(failed)
+
+    @staticmethod
+    def send_over(mail, emails):
+        '''
+        Send the emails over the connection, a connection that does not
+        open fails them all. Returns the sent and the failed ones
+        '''
+        try:
+            mail.open()
+        except Exception as error:
+            for email in emails:
+                email.fail(error)
+            return [], emails
+        sent, failed = [], []
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email,
+                [email.to], connection=mail,
+            )
+            try:
+                message.send()
+            except Exception as error:
+                email.fail(error)
+                failed.append(email)
+            else:
+                email.sent_at = timezone.now()
+                sent.append(email)
+        try:
+            mail.close()
+        except Exception:
+            # the emails are out already
+            pass
+        return sent, failed
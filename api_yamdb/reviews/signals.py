@@ -0,0 +1,91 @@
+from functools import partial
+from threading import local
+from weakref import WeakValueDictionary
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import LeaderboardEntry, Review, Title, TitleStats
+
+# titles being deleted in this thread by their ids, the reviews go
+# with them and the ratings and stats of these titles need no changes
+deleting = local()
+
+
+def deleting_titles():
+    if not hasattr(deleting, 'titles'):
+        deleting.titles = WeakValueDictionary()
+    return deleting.titles
+
+
+def title_is_deleted(title_id):
+    # a deleted title loses its pk after every post_delete signal
+    title = deleting_titles().get(title_id)
+    return title is not None and title.pk == title_id
+
+
+def add_score(title_id, score, reviewed_at=None):
+    Title.change_rating(title_id, score, 1)
+    TitleStats.record(title_id, added=score, reviewed_at=reviewed_at)
+
+
+def remove_score(title_id, score):
+    Title.change_rating(title_id, -score, -1)
+    TitleStats.record(title_id, removed=score)
+
+
+def refresh_leaderboards(*title_ids):
+    # out of the writing transaction, boards lock their group rows
+    for title_id in set(title_ids) - {None}:
+        transaction.on_commit(
+            partial(LeaderboardEntry.refresh_for_title, title_id)
+        )
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    '''
+    Keep the stored ratings and score stats of titles in step with every
+    save of a review: the API, the admin site or the shell
+    '''
+    if raw:
+        return
+    old_title_id, old_score = (
+        (None, None) if created
+        else getattr(instance, 'stored', (None, None))
+    )
+    title_id, score = instance.title_id, instance.score
+    if not created and old_score is None:
+        # saved without being loaded, the old score is unknown
+        titles = Title.objects.filter(pk=title_id)
+        Title.rebuild_ratings(titles)
+        TitleStats.rebuild(titles)
+    elif old_title_id == title_id and title_id is not None:
+        Title.change_rating(title_id, score - old_score)
+        TitleStats.record(title_id, added=score, removed=old_score)
+    else:
+        if old_title_id is not None:
+            remove_score(old_title_id, old_score)
+        if title_id is not None:
+            add_score(title_id, score, instance.pub_date)
+    instance.stored = (title_id, score)
+    refresh_leaderboards(old_title_id, title_id)
+
+
+@receiver(pre_delete, sender=Title)
+def title_deleting(sender, instance, **kwargs):
+    # sent before any row of the cascade is deleted
+    deleting_titles()[instance.pk] = instance
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    '''Also runs for reviews deleted with their author or title'''
+    title_id, score = getattr(
+        instance, 'stored', (instance.title_id, instance.score)
+    )
+    if title_id is None or title_is_deleted(title_id):
+        return
+    remove_score(title_id, score)
+    refresh_leaderboards(title_id)
@@ -1,9 +1,34 @@
 import sys
 from os.path import abspath, dirname, join
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
 pytest_plugins = [
+    'tests.fixtures.fixture_user',
+    'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_perf',
+    'tests.fixtures.fixture_csv',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+@pytest.fixture
+def slug_caches(clear_cache):
+    '''
+    Warm process caches of category and genre slugs, as they are
+    in a running worker, for tests counting queries of single requests
+    '''
+    from api.slugs import category_slugs, genre_slugs
+
+    category_slugs.load()
+    genre_slugs.load()
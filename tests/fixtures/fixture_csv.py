@@ -0,0 +1,52 @@
+import csv
+
+import pytest
+
+CSV_DATA = {
+    'category.csv': [
+        ('id', 'name', 'slug'),
+        (1, 'Фильм', 'movie'),
+        (2, 'Книга', 'book'),
+    ],
+    'titles.csv': [
+        ('id', 'name', 'year', 'category'),
+        (1, 'Побег из Шоушенка', 1994, 1),
+        (2, 'Крестный отец', 1972, 1),
+        (3, 'Мастер и Маргарита', 1967, 2),
+    ],
+    'users.csv': [
+        ('id', 'username', 'email', 'role', 'bio', 'first_name', 'last_name'),
+        (100, 'bingobongo', 'bingobongo@yamdb.fake', 'user', '', '', ''),
+        (101, 'capt_obvious', 'capt_obvious@yamdb.fake', 'admin', '', '', ''),
+    ],
+    'genre.csv': [
+        ('id', 'name', 'slug'),
+        (1, 'Драма', 'drama'),
+        (2, 'Комедия', 'comedy'),
+    ],
+    'genre_title.csv': [
+        ('id', 'title_id', 'genre_id'),
+        (1, 1, 1),
+        (2, 2, 1),
+        (3, 3, 2),
+    ],
+    'review.csv': [
+        ('id', 'title_id', 'text', 'author', 'score', 'pub_date'),
+        (1, 1, 'Шедевр', 100, 10, '2019-09-24T21:08:21.567Z'),
+        (2, 1, 'Хорошо', 101, 7, '2019-09-25T21:08:21.567Z'),
+        (3, 2, 'Неплохо', 100, 6, '2019-09-26T21:08:21.567Z'),
+    ],
+    'comments.csv': [
+        ('id', 'review_id', 'text', 'author', 'pub_date'),
+        (1, 1, 'Согласен', 101, '2019-09-27T21:08:21.567Z'),
+        (2, 3, 'Не согласен', 101, '2019-09-28T21:08:21.567Z'),
+    ],
+}
+
+
+@pytest.fixture
+def csv_directory(tmp_path):
+    for name, rows in CSV_DATA.items():
+        with open(tmp_path / name, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+    return str(tmp_path)
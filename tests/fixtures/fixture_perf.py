@@ -0,0 +1,100 @@
+import os
+
+import pytest
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from reviews.models import (Category, Comment, Genre, GenreTitle,
+                            LeaderboardEntry, Review, Title, TitleStats, User)
+
+# rows per table for YAMDB_PERF_SCALE=small (default) and =large
+PERF_SCALES = {
+    'small': {
+        'categories': 5, 'genres': 10, 'titles': 50, 'users': 20,
+        'reviews': 500, 'comments': 1000,
+    },
+    'large': {
+        'categories': 50, 'genres': 100, 'titles': 5000, 'users': 100,
+        'reviews': 300000, 'comments': 300000,
+    },
+}
+# sqlite limits the rows of one INSERT, django picks the size there
+BATCH_SIZE = 5000 if connection.vendor == 'postgresql' else None
+
+
+def perf_scale():
+    scale = os.getenv('YAMDB_PERF_SCALE', 'small')
+    if scale not in PERF_SCALES:
+        raise pytest.UsageError(
+            f'YAMDB_PERF_SCALE должен быть одним из {sorted(PERF_SCALES)}'
+        )
+    return scale
+
+
+def seed_perf_dataset(sizes):
+    Category.objects.bulk_create(
+        Category(id=number, name=f'Категория {number}',
+                 slug=f'perf-category-{number}')
+        for number in range(1, sizes['categories'] + 1)
+    )
+    Genre.objects.bulk_create(
+        Genre(id=number, name=f'Жанр {number}', slug=f'perf-genre-{number}')
+        for number in range(1, sizes['genres'] + 1)
+    )
+    Title.objects.bulk_create(
+        (Title(id=number, name=f'Произведение {number}',
+               year=1900 + number % 120,
+               description=f'Описание произведения {number}',
+               category_id=number % sizes['categories'] + 1)
+         for number in range(1, sizes['titles'] + 1)),
+        batch_size=BATCH_SIZE,
+    )
+    GenreTitle.objects.bulk_create(
+        (GenreTitle(title_id=title_id,
+                    genre_id=(title_id + shift) % sizes['genres'] + 1)
+         for title_id in range(1, sizes['titles'] + 1)
+         for shift in range(2)),
+        batch_size=BATCH_SIZE,
+    )
+    User.objects.bulk_create(
+        (User(id=number, username=f'perf-user-{number}',
+              email=f'perf-user-{number}@yamdb.fake')
+         for number in range(1, sizes['users'] + 1)),
+        batch_size=BATCH_SIZE,
+    )
+    # every user reviews a title at most once
+    Review.objects.bulk_create(
+        (Review(id=number, title_id=(number - 1) % sizes['titles'] + 1,
+                author_id=(number - 1) // sizes['titles'] % sizes['users'] + 1,
+                text=f'Отзыв {number}', score=number % 11)
+         for number in range(1, sizes['reviews'] + 1)),
+        batch_size=BATCH_SIZE,
+    )
+    Comment.objects.bulk_create(
+        (Comment(id=number, review_id=(number - 1) % sizes['reviews'] + 1,
+                 author_id=number % sizes['users'] + 1,
+                 text=f'Комментарий {number}')
+         for number in range(1, sizes['comments'] + 1)),
+        batch_size=BATCH_SIZE,
+    )
+    Title.rebuild_ratings()
+    TitleStats.rebuild()
+    LeaderboardEntry.rebuild()
+    # explicit ids do not move postgres sequences forward
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [Category, Genre, Title, User, Review, Comment]
+        ):
+            cursor.execute(sql)
+    return sizes
+
+
+@pytest.fixture(scope='module')
+def perf_dataset(django_db_setup, django_db_blocker):
+    '''
+    Seed the synthetic dataset once per module
+    and roll it back when the module is done
+    '''
+    with django_db_blocker.unblock():
+        with transaction.atomic():
+            yield seed_perf_dataset(PERF_SCALES[perf_scale()])
+            transaction.set_rollback(True)
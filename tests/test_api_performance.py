@@ -0,0 +1,294 @@
+import json
+import math
+import os
+import subprocess
+import time
+from collections import namedtuple
+
+import pytest
+from api.slugs import category_slugs, genre_slugs
+from api.urls import router, urlpatterns
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import Category, Comment, Genre, Review, Title, User
+
+from .conftest import root_dir
+from .fixtures.fixture_perf import perf_scale
+
+# every iteration of an endpoint runs with its own number n,
+# `setup(n)` prepares objects outside of the measured request
+# and returns the kwargs for formatting `url`
+Endpoint = namedtuple(
+    'Endpoint',
+    'name method url client max_queries p95_ms data setup format',
+    defaults=(None, None, None),
+)
+
+PERF_REPEAT = int(os.getenv('YAMDB_PERF_REPEAT', 5))
+PERF_BUDGET_FACTOR = float(os.getenv('YAMDB_PERF_BUDGET_FACTOR', 1))
+PERF_REPORT = os.getenv(
+    'YAMDB_PERF_REPORT', os.path.join(root_dir, 'perf_report.json')
+)
+PERF_RESULTS = {}
+
+
+def create_category(n):
+    return {'slug': Category.objects.create(
+        name='Удаляемая', slug=f'bench-removed-{n}'
+    ).slug}
+
+
+def create_genre(n):
+    return {'slug': Genre.objects.create(
+        name='Удаляемый', slug=f'bench-removed-{n}'
+    ).slug}
+
+
+def create_title(n):
+    return {'id': Title.objects.create(name='Удаляемое', year=2000).id}
+
+
+def create_review(n):
+    author = User.objects.create(
+        username=f'bench-reviewer-{n}', email=f'bench-reviewer-{n}@yamdb.fake'
+    )
+    return {'id': Review.objects.create(
+        title_id=1, author=author, text='Удаляемый', score=5
+    ).id}
+
+
+def create_comment(n):
+    return {'id': Comment.objects.create(
+        review_id=1, author_id=1, text='Удаляемый'
+    ).id}
+
+
+def create_user(n):
+    return {'username': User.objects.create(
+        username=f'bench-removed-{n}', email=f'bench-removed-{n}@yamdb.fake'
+    ).username}
+
+
+ENDPOINTS = [
+    Endpoint('categories-list', 'get', '/api/v1/categories/', 'guest', 2,
+             100),
+    Endpoint('categories-create', 'post', '/api/v1/categories/', 'admin',
+             2, 100,
+             data=lambda n: {'name': 'Новая', 'slug': f'bench-category-{n}'}),
+    Endpoint('categories-destroy', 'delete', '/api/v1/categories/{slug}/',
+             'admin', 4, 100, setup=create_category),
+    Endpoint('genres-list', 'get', '/api/v1/genres/', 'guest', 2, 100),
+    Endpoint('genres-create', 'post', '/api/v1/genres/', 'admin', 2, 100,
+             data=lambda n: {'name': 'Новый', 'slug': f'bench-genre-{n}'}),
+    Endpoint('genres-destroy', 'delete', '/api/v1/genres/{slug}/', 'admin',
+             4, 100, setup=create_genre),
+    Endpoint('titles-list', 'get', '/api/v1/titles/', 'guest', 3, 150),
+    Endpoint('titles-list-filtered', 'get',
+             '/api/v1/titles/?genre=perf-genre-2&category=perf-category-1',
+             'guest', 3, 150),
+    Endpoint('titles-list-genres-any', 'get',
+             '/api/v1/titles/?genre=perf-genre-1,perf-genre-2,perf-genre-3',
+             'guest', 3, 150),
+    Endpoint('titles-list-genres-all', 'get',
+             '/api/v1/titles/?genre=perf-genre-1,perf-genre-2'
+             '&genre_mode=all', 'guest', 3, 150),
+    Endpoint('titles-search', 'get', '/api/v1/titles/?search=Произведение 7',
+             'guest', 4, 250),
+    Endpoint('titles-list-top-rated', 'get',
+             '/api/v1/titles/?ordering=-rating&genre=perf-genre-2'
+             '&pagination=cursor', 'guest', 2, 150),
+    Endpoint('titles-list-stats', 'get', '/api/v1/titles/?expand=stats',
+             'guest', 3, 150),
+    Endpoint('titles-list-lean', 'get', '/api/v1/titles/?fields=id,name',
+             'guest', 2, 100),
+    Endpoint('titles-retrieve', 'get', '/api/v1/titles/1/', 'guest', 2, 100),
+    Endpoint('titles-stats', 'get', '/api/v1/titles/1/stats/', 'guest', 1,
+             100),
+    Endpoint('titles-create', 'post', '/api/v1/titles/', 'admin', 6, 150,
+             data=lambda n: {
+                 'name': f'Новое {n}', 'year': 2000,
+                 'category': 'perf-category-1',
+                 'genre': ['perf-genre-1', 'perf-genre-2'],
+             }),
+    Endpoint('titles-bulk', 'post', '/api/v1/titles/bulk/', 'admin', 34,
+             250, format='json', data=lambda n: [
+                 {'name': f'Пакет {n}-{i}', 'year': 2000,
+                  'category': 'perf-category-1',
+                  'genre': ['perf-genre-1', 'perf-genre-2']}
+                 for i in range(3)
+             ] + [{'id': 1, 'name': f'Обновлённое {n}'}]),
+    Endpoint('titles-update', 'patch', '/api/v1/titles/1/', 'admin', 25, 150,
+             data=lambda n: {'name': f'Обновлённое {n}'}),
+    Endpoint('titles-destroy', 'delete', '/api/v1/titles/{id}/', 'admin', 7,
+             150, setup=create_title),
+    Endpoint('reviews-list', 'get', '/api/v1/titles/1/reviews/', 'guest', 3,
+             100),
+    Endpoint('reviews-retrieve', 'get', '/api/v1/titles/1/reviews/1/',
+             'guest', 1, 100),
+    Endpoint('reviews-create', 'post', '/api/v1/titles/{id}/reviews/',
+             'user', 28, 150, data=lambda n: {'text': 'Новый', 'score': 7},
+             setup=lambda n: {'id': n + 1}),
+    Endpoint('reviews-update', 'patch', '/api/v1/titles/1/reviews/1/',
+             'admin', 27, 100, data=lambda n: {'score': n % 11}),
+    Endpoint('reviews-destroy', 'delete', '/api/v1/titles/1/reviews/{id}/',
+             'admin', 28, 100, setup=create_review),
+    Endpoint('comments-list', 'get', '/api/v1/titles/1/reviews/1/comments/',
+             'guest', 3, 100),
+    Endpoint('comments-retrieve', 'get',
+             '/api/v1/titles/1/reviews/1/comments/1/', 'guest', 1, 100),
+    Endpoint('comments-create', 'post',
+             '/api/v1/titles/1/reviews/1/comments/', 'user', 2, 100,
+             data=lambda n: {'text': f'Новый {n}'}),
+    Endpoint('comments-update', 'patch',
+             '/api/v1/titles/1/reviews/1/comments/1/', 'admin', 2, 100,
+             data=lambda n: {'text': f'Обновлённый {n}'}),
+    Endpoint('comments-destroy', 'delete',
+             '/api/v1/titles/1/reviews/1/comments/{id}/', 'admin', 2, 100,
+             setup=create_comment),
+    Endpoint('users-list', 'get', '/api/v1/users/', 'admin', 2, 100),
+    Endpoint('users-retrieve', 'get', '/api/v1/users/perf-user-1/', 'admin',
+             1, 100),
+    Endpoint('users-create', 'post', '/api/v1/users/', 'admin', 3, 100,
+             data=lambda n: {
+                 'username': f'bench-user-{n}',
+                 'email': f'bench-user-{n}@yamdb.fake',
+             }),
+    Endpoint('users-update', 'patch', '/api/v1/users/perf-user-1/', 'admin',
+             2, 100, data=lambda n: {'bio': f'Биография {n}'}),
+    Endpoint('users-destroy', 'delete', '/api/v1/users/{username}/', 'admin',
+             7, 150, setup=create_user),
+    Endpoint('users-export', 'get', '/api/v1/users/export/?output=csv',
+             'admin', 1, 500),
+    Endpoint('users-me', 'get', '/api/v1/users/me/', 'user', 1, 100),
+    Endpoint('signup', 'post', '/api/v1/auth/signup/', 'guest', 7, 150,
+             data=lambda n: {
+                 'username': f'bench-signup-{n}',
+                 'email': f'bench-signup-{n}@yamdb.fake',
+             }),
+    Endpoint('search-reviews-list', 'get',
+             '/api/v1/search/reviews/?search=Отзыв 7', 'guest', 3, 400),
+    Endpoint('search-comments-list', 'get',
+             '/api/v1/search/comments/?search=Комментарий 7', 'guest', 3,
+             400),
+    Endpoint('export-reviews-list', 'get', '/api/v1/export/reviews/',
+             'admin', 1, 500),
+    Endpoint('export-comments-list', 'get',
+             '/api/v1/export/comments/?output=csv', 'admin', 1, 500),
+    Endpoint('leaderboards-genres-list', 'get',
+             '/api/v1/leaderboards/genres/', 'guest', 3, 150),
+    Endpoint('leaderboards-genres-retrieve', 'get',
+             '/api/v1/leaderboards/genres/perf-genre-1/', 'guest', 2, 100),
+    Endpoint('leaderboards-categories-list', 'get',
+             '/api/v1/leaderboards/categories/', 'guest', 3, 150),
+    Endpoint('leaderboards-categories-retrieve', 'get',
+             '/api/v1/leaderboards/categories/perf-category-1/', 'guest', 2,
+             100),
+    Endpoint('token', 'post', '/api/v1/auth/token/', 'guest', 1, 100,
+             data=lambda n: {
+                 'username': 'perf-user-1', 'confirmation_code': 'wrong',
+             }),
+]
+
+
+def run_on_commit(start):
+    '''
+    Run the callbacks the request left for its commit, the dataset
+    transaction never commits and they are part of the request cost
+    '''
+    while len(connection.run_on_commit) > start:
+        _, callback = connection.run_on_commit.pop(start)
+        callback()
+
+
+def percentile(samples, share):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=root_dir, check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        ).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@pytest.fixture(scope='module', autouse=True)
+def perf_report():
+    yield
+    if not PERF_RESULTS:
+        return
+    with open(PERF_REPORT, 'w', encoding='utf-8') as report:
+        json.dump({
+            'commit': current_commit(),
+            'vendor': connection.vendor,
+            'scale': perf_scale(),
+            'repeat': PERF_REPEAT,
+            'endpoints': PERF_RESULTS,
+        }, report, ensure_ascii=False, indent=2)
+
+
+def test_every_route_is_benchmarked():
+    names = {endpoint.name for endpoint in ENDPOINTS}
+    for prefix, viewset, basename in router.registry:
+        assert f'{basename}-list' in names, (
+            f'Добавьте маршрут {prefix} в ENDPOINTS'
+        )
+    for pattern in urlpatterns:
+        if getattr(pattern, 'name', None):
+            assert pattern.name in names, (
+                f'Добавьте маршрут {pattern.pattern} в ENDPOINTS'
+            )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'endpoint', ENDPOINTS, ids=[endpoint.name for endpoint in ENDPOINTS]
+)
+def test_endpoint_budget(endpoint, perf_dataset, slug_caches, request):
+    # budgets are per request of a running worker, with warm slug caches
+    client = request.getfixturevalue(f'{endpoint.client}_client')
+    timings, queries = [], []
+    for n in range(PERF_REPEAT):
+        url_kwargs = endpoint.setup(n) if endpoint.setup else {}
+        url = endpoint.url.format(**url_kwargs)
+        data = endpoint.data(n) if endpoint.data else None
+        # every read is measured as a miss of the response cache
+        cache.clear()
+        category_slugs.load()
+        genre_slugs.load()
+        pending = len(connection.run_on_commit)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, endpoint.method)(
+                url, data=data, format=endpoint.format
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            run_on_commit(pending)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+        assert response.status_code < 500, (
+            f'{endpoint.method.upper()} {url} вернул {response.status_code}'
+        )
+
+    result = {
+        'status': response.status_code,
+        'queries': max(queries),
+        'max_queries': endpoint.max_queries,
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'budget_p95_ms': endpoint.p95_ms * PERF_BUDGET_FACTOR,
+    }
+    PERF_RESULTS[endpoint.name] = result
+    assert result['queries'] <= endpoint.max_queries, (
+        f'{endpoint.name}: {result["queries"]} запросов к базе, '
+        f'допустимо не больше {endpoint.max_queries}'
+    )
+    assert result['p95_ms'] <= result['budget_p95_ms'], (
+        f'{endpoint.name}: p95 {result["p95_ms"]} мс превышает '
+        f'бюджет {result["budget_p95_ms"]} мс'
+    )
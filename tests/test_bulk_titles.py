@@ -0,0 +1,127 @@
+import json
+
+import pytest
+from reviews.models import GenreTitle, Title, TitleStats
+
+URL = '/api/v1/titles/bulk/'
+
+
+@pytest.mark.django_db
+class TestBulkTitles:
+
+    def test_creates_and_updates(self, admin_client, title, category, genres,
+                                 slug_caches):
+        response = admin_client.post(URL, data=[
+            {'name': 'Первое', 'year': 2001, 'category': 'movie',
+             'genre': ['drama', 'comedy']},
+            {'name': 'Без жанров', 'year': 2002, 'genre': []},
+            {'id': title.id, 'name': 'Новое имя', 'genre': ['comedy']},
+            {'id': 100500, 'name': 'Нет такого'},
+            {'name': 'Второе', 'year': 2003, 'genre': ['missing']},
+        ], format='json')
+        assert response.status_code == 200
+        results = response.json()
+        assert [result['status'] for result in results] == [
+            201, 400, 200, 404, 400
+        ]
+        assert [result['index'] for result in results] == list(range(5))
+        assert 'genre' in results[4]['errors']
+
+        created = Title.objects.get(pk=results[0]['id'])
+        assert created.name == 'Первое'
+        assert created.category_id == category.id
+        assert set(created.genre.all()) == set(genres)
+        assert TitleStats.objects.filter(title=created).exists()
+
+        title.refresh_from_db()
+        assert results[2]['id'] == title.id
+        assert title.name == 'Новое имя'
+        assert title.year == 1994
+        assert list(title.genre.all()) == [genres[1]]
+
+    def test_invalid_items_do_not_stop_others(self, admin_client, title,
+                                              category, genres, slug_caches):
+        response = admin_client.post(URL, data=[
+            {'id': [title.id], 'name': 'Список'},
+            {'id': str(title.id), 'name': 'Строка'},
+            {'name': 'Будущее', 'year': 3000, 'category': 'movie',
+             'genre': ['drama']},
+            {'name': 'Настоящее', 'year': 2020, 'category': 'movie',
+             'genre': ['drama']},
+        ], format='json')
+        assert response.status_code == 200
+        results = response.json()
+        assert [result['status'] for result in results] == [400, 400, 400, 201]
+        assert 'id' in results[0]['errors']
+        assert 'id' in results[1]['errors']
+        assert 'year' in results[2]['errors']
+        assert Title.objects.filter(name='Настоящее').exists()
+        assert not Title.objects.filter(name='Будущее').exists()
+        title.refresh_from_db()
+        assert title.name not in ('Список', 'Строка')
+
+    def test_ndjson_stream(self, admin_client, category, genres):
+        lines = [
+            {'name': f'Строка {n}', 'year': 2000 + n, 'category': 'movie',
+             'genre': ['drama']}
+            for n in range(3)
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\n\n'
+        response = admin_client.post(
+            URL, data=body.encode(), content_type='application/x-ndjson'
+        )
+        assert response.status_code == 200
+        assert [result['status'] for result in response.json()] == [201] * 3
+        assert GenreTitle.objects.filter(title__name__startswith='Строка',
+                                         genre=genres[0]).count() == 3
+
+    def test_broken_ndjson(self, admin_client):
+        response = admin_client.post(
+            URL, data=b'{"name": "1"}\n{broken\n',
+            content_type='application/x-ndjson',
+        )
+        assert response.status_code == 400
+        assert 'Строка 2' in response.json()['detail']
+
+    def test_rejects_objects_and_large_batches(self, admin_client,
+                                               monkeypatch):
+        from api.views import TitleViewSet
+
+        response = admin_client.post(URL, data={'name': 'Одно'},
+                                     format='json')
+        assert response.status_code == 400
+        monkeypatch.setattr(TitleViewSet, 'bulk_max_items', 1)
+        response = admin_client.post(URL, data=[{}, {}], format='json')
+        assert response.status_code == 400
+
+    def test_only_admin(self, user_client, guest_client):
+        assert user_client.post(URL, data=[], format='json').status_code == 403
+        assert guest_client.post(
+            URL, data=[], format='json'
+        ).status_code == 401
+
+    def test_queries_do_not_grow_with_items(self, admin_client, category,
+                                            genres, slug_caches,
+                                            django_assert_max_num_queries):
+        items = [
+            {'name': f'Пакет {n}', 'year': 2000, 'category': 'movie',
+             'genre': ['drama', 'comedy']}
+            for n in range(50)
+        ]
+        # SQLite can not return ids of a bulk insert, so it saves titles
+        # one by one, stats rows and genre links are inserted at once
+        with django_assert_max_num_queries(len(items) + 8):
+            response = admin_client.post(URL, data=items, format='json')
+        assert response.status_code == 200
+        assert GenreTitle.objects.filter(
+            title__name__startswith='Пакет'
+        ).count() == 100
+
+    def test_drops_cached_lists(self, admin_client, guest_client, category,
+                                genres):
+        assert guest_client.get('/api/v1/titles/').json()['count'] == 0
+        admin_client.post(URL, data=[
+            {'name': 'Первое', 'year': 2001, 'category': 'movie',
+             'genre': ['drama']},
+        ], format='json')
+        assert guest_client.get('/api/v1/titles/').json()['count'] == 1
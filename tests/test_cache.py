@@ -0,0 +1,59 @@
+import pytest
+from reviews.models import Category, Title
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+
+    def test_repeated_read_skips_database(self, guest_client, title,
+                                          django_assert_num_queries):
+        url = f'/api/v1/titles/{title.id}/'
+        first = guest_client.get(url)
+        with django_assert_num_queries(0):
+            second = guest_client.get(url)
+        assert second.status_code == 200
+        assert second.json() == first.json()
+
+    def test_query_params_are_normalized(self, guest_client, title,
+                                         django_assert_num_queries):
+        guest_client.get('/api/v1/titles/?year=1994&name=Побег')
+        with django_assert_num_queries(0):
+            guest_client.get('/api/v1/titles/?name=Побег&year=1994')
+
+    def test_new_review_invalidates_its_title(self, guest_client,
+                                              user_client, title):
+        detail = f'/api/v1/titles/{title.id}/'
+        reviews = f'/api/v1/titles/{title.id}/reviews/'
+        assert guest_client.get(detail).json()['rating'] is None
+        assert guest_client.get(reviews).json()['count'] == 0
+
+        user_client.post(reviews, data={'text': 'Шедевр', 'score': 9})
+        assert guest_client.get(detail).json()['rating'] == 9
+        assert guest_client.get(reviews).json()['count'] == 1
+        assert guest_client.get('/api/v1/titles/').json()[
+            'results'][0]['rating'] == 9
+
+    def test_category_change_invalidates_titles(self, guest_client, title,
+                                                category):
+        guest_client.get('/api/v1/titles/')
+        guest_client.get('/api/v1/categories/')
+        category.name = 'Кино'
+        category.save()
+
+        titles = guest_client.get('/api/v1/titles/').json()['results']
+        assert titles[0]['category']['name'] == 'Кино'
+        categories = guest_client.get('/api/v1/categories/').json()
+        assert categories['results'][0]['name'] == 'Кино'
+
+    def test_unrelated_title_stays_cached(self, guest_client, user_client,
+                                          title, category,
+                                          django_assert_num_queries):
+        other = Title.objects.create(
+            name='Другое', year=2000, category=category
+        )
+        guest_client.get(f'/api/v1/titles/{other.id}/')
+        user_client.post(
+            f'/api/v1/titles/{title.id}/reviews/', data={'text': 'a', 'score': 1}
+        )
+        with django_assert_num_queries(0):
+            guest_client.get(f'/api/v1/titles/{other.id}/')
@@ -0,0 +1,55 @@
+import pytest
+from reviews.models import Review
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    @pytest.fixture
+    def review(self, title, user):
+        return Review.objects.create(title=title, author=user, text='a')
+
+    def test_unchanged_list_is_not_modified(self, guest_client, title,
+                                            review,
+                                            django_assert_num_queries):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        etag = guest_client.get(url)['ETag']
+        assert etag
+
+        with django_assert_num_queries(0):
+            response = guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert not response.content
+
+    def test_write_changes_etag(self, guest_client, user_client, title,
+                                review):
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        etag = guest_client.get(url)['ETag']
+        user_client.post(url, data={'text': 'Согласен'})
+
+        response = guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert response.json()['count'] == 1
+
+    def test_etag_depends_on_query(self, guest_client, title):
+        first = guest_client.get('/api/v1/titles/?year=1994')['ETag']
+        second = guest_client.get('/api/v1/titles/?year=1995')['ETag']
+        assert first != second
+
+    def test_missing_parent_has_no_etag(self, guest_client):
+        response = guest_client.get('/api/v1/titles/404/reviews/')
+        assert response.status_code == 404
+        assert not response.has_header('ETag')
+
+    def test_any_tag_needs_the_resource(self, guest_client, title):
+        response = guest_client.get(
+            '/api/v1/titles/99999/', HTTP_IF_NONE_MATCH='*'
+        )
+        assert response.status_code == 404
+        response = guest_client.get(
+            f'/api/v1/titles/{title.id}/', HTTP_IF_NONE_MATCH='*'
+        )
+        assert response.status_code == 304
+        assert response.has_header('ETag')
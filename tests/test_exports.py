@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from api import exports
+from django.utils import timezone
+from reviews.models import Comment, Review
+
+
+def read(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.fixture
+def reviews(title, user, another_user):
+    first = Review.objects.create(
+        title=title, author=user, text='Первый, с запятой', score=7
+    )
+    second = Review.objects.create(
+        title=title, author=another_user, text='Второй', score=3
+    )
+    Review.objects.filter(pk=first.pk).update(
+        pub_date=timezone.now() - timedelta(days=10)
+    )
+    Comment.objects.create(review=first, author=another_user, text='Да')
+    Comment.objects.create(review=second, author=user, text='Нет')
+    return first, second
+
+
+@pytest.mark.django_db
+class TestExports:
+
+    def test_reviews_ndjson(self, admin_client, reviews, user):
+        response = admin_client.get('/api/v1/export/reviews/')
+        assert response.status_code == 200
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = [json.loads(line) for line in read(response).splitlines()]
+        assert [row['id'] for row in rows] == [review.id for review in reviews]
+        assert rows[0]['author'] == user.username
+        assert rows[0]['title'] == reviews[0].title_id
+        assert rows[0]['score'] == 7
+        assert set(rows[0]) == {
+            'id', 'title', 'author', 'text', 'score', 'pub_date'
+        }
+
+    def test_comments_csv(self, admin_client, reviews, user):
+        response = admin_client.get(
+            '/api/v1/export/comments/', {'output': 'csv', 'author': 'TestUser'}
+        )
+        assert response['Content-Type'].startswith('text/csv')
+        assert 'comments.csv' in response['Content-Disposition']
+        rows = list(csv.DictReader(io.StringIO(read(response))))
+        assert len(rows) == 1
+        assert rows[0]['text'] == 'Нет'
+        assert rows[0]['review'] == str(reviews[1].id)
+        assert rows[0]['author'] == user.username
+
+    def test_filters(self, admin_client, reviews):
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = admin_client.get(
+            '/api/v1/export/reviews/', {'since': since, 'output': 'csv'}
+        )
+        rows = list(csv.DictReader(io.StringIO(read(response))))
+        assert [row['id'] for row in rows] == [str(reviews[1].id)]
+        response = admin_client.get(
+            '/api/v1/export/comments/', {'title': reviews[0].title_id + 1}
+        )
+        assert read(response) == ''
+
+    def test_rejects_bad_params(self, admin_client, reviews):
+        response = admin_client.get(
+            '/api/v1/export/reviews/', {'output': 'xml'}
+        )
+        assert response.status_code == 400
+        response = admin_client.get(
+            '/api/v1/export/reviews/', {'since': 'вчера'}
+        )
+        assert response.status_code == 400
+
+    def test_only_admin(self, user_client, guest_client):
+        assert user_client.get('/api/v1/export/reviews/').status_code == 403
+        assert guest_client.get('/api/v1/export/comments/').status_code == 401
+
+    def test_reads_in_chunks(self, admin_client, reviews, user, monkeypatch,
+                             django_assert_num_queries):
+        monkeypatch.setattr(exports, 'CHUNK_SIZE', 2)
+        monkeypatch.setattr(exports, 'LINES_PER_CHUNK', 2)
+        Comment.objects.bulk_create(
+            Comment(review=reviews[0], author=user, text=str(n))
+            for n in range(3)
+        )
+        response = admin_client.get('/api/v1/export/comments/')
+        chunks = iter(response.streaming_content)
+        # nothing is read before the body is consumed,
+        # then one cursor serves every chunk
+        with django_assert_num_queries(1):
+            assert next(chunks).count(b'\n') == 2
+            assert sum(chunk.count(b'\n') for chunk in chunks) == 3
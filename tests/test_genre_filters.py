@@ -0,0 +1,120 @@
+import json
+import os
+
+import pytest
+from api.filters import TitleFilter
+from django.db import connection
+from django.http import QueryDict
+from reviews.models import Genre, Title
+
+# opt-in benchmark on postgres, e.g. YAMDB_GENRE_ROWS=1000000
+GENRE_ROWS = int(os.getenv('YAMDB_GENRE_ROWS', 0))
+
+
+@pytest.fixture
+def titles(category, genres):
+    drama, comedy = genres
+    both = Title.objects.create(name='Обе', year=2000, category=category)
+    both.genre.set([drama, comedy])
+    only_drama = Title.objects.create(name='Драма', year=2000)
+    only_drama.genre.set([drama])
+    only_comedy = Title.objects.create(name='Комедия', year=2000)
+    only_comedy.genre.set([comedy])
+    return both, only_drama, only_comedy
+
+
+def names(client, **params):
+    response = client.get('/api/v1/titles/', params)
+    assert response.status_code == 200
+    data = response.json()
+    assert data['count'] == len(data['results'])
+    return sorted(title['name'] for title in data['results'])
+
+
+@pytest.mark.django_db
+class TestGenreFilters:
+
+    def test_any_genre_has_no_duplicates(self, guest_client, titles):
+        assert names(guest_client, genre='drama,comedy') == [
+            'Драма', 'Комедия', 'Обе'
+        ]
+
+    def test_all_genres(self, guest_client, titles):
+        assert names(
+            guest_client, genre='drama,comedy', genre_mode='all'
+        ) == ['Обе']
+        assert names(guest_client, genre='drama', genre_mode='all') == [
+            'Драма', 'Обе'
+        ]
+
+    def test_unknown_slugs(self, guest_client, titles):
+        assert names(guest_client, genre='drama,missing') == ['Драма', 'Обе']
+        assert names(
+            guest_client, genre='drama,missing', genre_mode='all'
+        ) == []
+        assert names(guest_client, genre='missing') == []
+        assert names(guest_client, category='missing') == []
+
+    def test_category_and_genre(self, guest_client, titles):
+        assert names(guest_client, genre='comedy', category='movie') == [
+            'Обе'
+        ]
+
+    def test_invalid_mode(self, guest_client, titles):
+        response = guest_client.get(
+            '/api/v1/titles/', {'genre': 'drama', 'genre_mode': 'some'}
+        )
+        assert response.status_code == 400
+
+
+def add_genre_titles(start, stop, genres):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO reviews_title (id, name, year, rating_sum,'
+            ' rating_count, rating_avg)'
+            " SELECT i, 'Произведение ' || i, 2000, 0, 0, 0"
+            ' FROM generate_series(%s, %s) AS i',
+            [start, stop - 1],
+        )
+        cursor.execute(
+            'INSERT INTO reviews_genretitle (title_id, genre_id)'
+            ' SELECT i, (%s::int[])[1 + i %% %s]'
+            ' FROM generate_series(%s, %s) AS i',
+            [genres, len(genres), start, stop - 1],
+        )
+        cursor.execute('ANALYZE reviews_title')
+        cursor.execute('ANALYZE reviews_genretitle')
+
+
+def page_cost(query):
+    queryset = TitleFilter(
+        QueryDict(query), queryset=Title.objects.all()
+    ).qs.order_by('id')[:11]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Total Cost']
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not GENRE_ROWS, reason='задайте YAMDB_GENRE_ROWS')
+def test_genre_page_cost_is_stable():
+    if connection.vendor != 'postgresql':
+        pytest.skip('план запроса сравнивается только в postgresql')
+    genres = [
+        Genre.objects.create(name=f'Жанр {number}', slug=f'bench-{number}').pk
+        for number in range(10)
+    ]
+    queries = ('genre=bench-1', 'genre=bench-1,bench-2,bench-3')
+
+    add_genre_titles(1, GENRE_ROWS // 10, genres)
+    small = [page_cost(query) for query in queries]
+    add_genre_titles(GENRE_ROWS // 10, GENRE_ROWS, genres)
+    large = [page_cost(query) for query in queries]
+
+    # a page costs about the same on a ten times larger table
+    for query, before, after in zip(queries, small, large):
+        assert after < before * 2, f'{query}: {before} -> {after}'
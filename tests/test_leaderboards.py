@@ -0,0 +1,107 @@
+import pytest
+from django.core.management import call_command
+from reviews.models import LeaderboardEntry, Title
+
+
+@pytest.fixture
+def rated_titles(category, genres):
+    rows = [
+        # name, rating sum, review count
+        ('Хит', 22, 3), ('Середняк', 15, 3), ('Новинка', 10, 1),
+        ('Провал', 3, 3),
+    ]
+    titles = []
+    for name, total, count in rows:
+        title = Title.objects.create(
+            name=name, year=2000, category=category,
+            rating_sum=total, rating_count=count, rating_avg=total / count,
+        )
+        title.genre.set(genres[:1])
+        titles.append(title)
+    return titles
+
+
+def board(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return [title['name'] for title in response.json()['titles']]
+
+
+@pytest.mark.django_db
+class TestLeaderboards:
+
+    def test_rebuild_command(self, guest_client, rated_titles, settings):
+        settings.LEADERBOARD_SIZE = 2
+        call_command('refresh_leaderboards')
+        assert board(
+            guest_client, '/api/v1/leaderboards/genres/drama/'
+        ) == ['Хит', 'Середняк']
+        assert board(
+            guest_client, '/api/v1/leaderboards/categories/movie/'
+        ) == ['Хит', 'Середняк']
+        # no titles of that genre have enough reviews
+        assert board(guest_client, '/api/v1/leaderboards/genres/comedy/') == []
+
+    def test_entry_fields(self, guest_client, rated_titles):
+        call_command('refresh_leaderboards')
+        response = guest_client.get('/api/v1/leaderboards/genres/drama/')
+        first = response.json()['titles'][0]
+        assert first == {
+            'position': 1, 'id': rated_titles[0].id, 'name': 'Хит',
+            'year': 2000, 'rating': 7.3, 'reviews_count': 3,
+        }
+        # rounded as the rating of the title
+        response = guest_client.get(f'/api/v1/titles/{rated_titles[0].id}/')
+        assert response.json()['rating'] == first['rating']
+
+    def test_board_is_one_lookup(self, guest_client, rated_titles,
+                                 django_assert_num_queries):
+        call_command('refresh_leaderboards')
+        with django_assert_num_queries(2):
+            guest_client.get('/api/v1/leaderboards/genres/drama/')
+
+    def test_list_and_missing_group(self, guest_client, rated_titles):
+        call_command('refresh_leaderboards')
+        response = guest_client.get('/api/v1/leaderboards/genres/')
+        assert {genre['slug'] for genre in response.json()['results']} == {
+            'drama', 'comedy'
+        }
+        response = guest_client.get('/api/v1/leaderboards/genres/missing/')
+        assert response.status_code == 404
+
+    def test_unqualified_title_leaves_boards_alone(
+            self, rated_titles, django_assert_num_queries):
+        call_command('refresh_leaderboards')
+        # the title, its genres and the nearby boards, nothing rebuilt
+        with django_assert_num_queries(3):
+            assert LeaderboardEntry.refresh_for_title(rated_titles[2].id) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_review_writes_refresh_boards(guest_client, user_client, admin_client,
+                                      rated_titles, settings):
+    settings.LEADERBOARD_MIN_REVIEWS = 1
+    call_command('refresh_leaderboards')
+    url = '/api/v1/leaderboards/genres/drama/'
+    assert board(guest_client, url) == [
+        'Новинка', 'Хит', 'Середняк', 'Провал'
+    ]
+
+    reviews = f'/api/v1/titles/{rated_titles[2].id}/reviews/'
+    review = user_client.post(reviews, data={'text': 'a', 'score': 1}).json()
+    # (10 + 1) / 2
+    assert board(guest_client, url) == [
+        'Хит', 'Новинка', 'Середняк', 'Провал'
+    ]
+
+    user_client.delete(f'{reviews}{review["id"]}/')
+    assert board(guest_client, url)[0] == 'Новинка'
+
+    admin_client.patch(
+        f'/api/v1/titles/{rated_titles[0].id}/',
+        data={'genre': ['comedy']}, format='json',
+    )
+    assert 'Хит' not in board(guest_client, url)
+    assert board(guest_client, '/api/v1/leaderboards/genres/comedy/') == [
+        'Хит'
+    ]
@@ -0,0 +1,134 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from reviews.management.commands.load_csv import (CSV_FILES, LoadTask,
+                                                  RowStream, get_copy_layout,
+                                                  get_stages, load_part,
+                                                  split_rows, worker_pool)
+from reviews.models import Category, Comment, GenreTitle, Review, Title
+
+
+@pytest.mark.django_db
+class TestLoadCsv:
+
+    def test_load_all_files(self, csv_directory):
+        out = StringIO()
+        call_command('load_csv', csv_directory, batch_size=2, stdout=out)
+        assert 'Error' not in out.getvalue()
+        assert out.getvalue().count('rows/s') == 7
+
+        assert Title.objects.get(pk=1).category_id == 1
+        assert GenreTitle.objects.count() == 3
+        review = Review.objects.get(pk=1)
+        assert (review.title_id, review.author_id) == (1, 100)
+        assert review.pub_date.isoformat() == '2019-09-24T21:08:21.567000+00:00'
+        assert Comment.objects.filter(review_id=3).count() == 1
+
+        title = Title.objects.get(pk=1)
+        assert (title.rating_sum, title.rating_count) == (17, 2)
+        assert title.stats.total == 2
+        # sequences continue after the loaded ids
+        assert Category.objects.create(name='Музыка', slug='music').pk == 3
+
+    def test_broken_file_is_rolled_back(self, csv_directory):
+        with open(f'{csv_directory}/genre_title.csv', 'a') as f:
+            f.write('4,1,not-a-number\n')
+        out = StringIO()
+        call_command('load_csv', csv_directory, stdout=out)
+        assert 'Error while importing data form genre_title.csv' in (
+            out.getvalue()
+        )
+        assert not GenreTitle.objects.exists()
+        assert Review.objects.count() == 3
+
+    def test_fast_mode_falls_back_to_orm(self, csv_directory):
+        out = StringIO()
+        call_command('load_csv', csv_directory, fast=True, stdout=out)
+        assert 'loading through the ORM' in out.getvalue()
+        assert Review.objects.count() == 3
+
+    def test_workers_fall_back_to_one_process(self, csv_directory):
+        out = StringIO()
+        call_command('load_csv', csv_directory, workers=4, stdout=out)
+        assert 'loading in one process' in out.getvalue()
+        assert out.getvalue().count('Stage ') == 4
+        assert Comment.objects.count() == 2
+
+    def test_shards_load_disjoint_rows(self, csv_directory):
+        options = {'batch_size': 10, 'fast': False, 'defer_indexes': False}
+        for stage in get_stages(CSV_FILES)[:2]:
+            for csv_file in stage:
+                load_part(LoadTask(csv_file.name, csv_directory, 0, None,
+                                   options))
+        results = [
+            load_part(LoadTask('review.csv', csv_directory, start, stop,
+                               options))
+            for start, stop in split_rows(3, 2)
+        ]
+        assert [result.rows for result in results] == [2, 1]
+        assert all(result.error is None for result in results)
+        assert sorted(Review.objects.values_list('id', flat=True)) == [
+            1, 2, 3,
+        ]
+
+
+class TestImportSchedule:
+
+    def test_stages_follow_foreign_keys(self):
+        assert [
+            [csv_file.name for csv_file in stage]
+            for stage in get_stages(CSV_FILES)
+        ] == [
+            ['category.csv', 'users.csv', 'genre.csv'],
+            ['titles.csv'],
+            ['genre_title.csv', 'review.csv'],
+            ['comments.csv'],
+        ]
+
+    def test_worker_pool_runs_tasks(self, tmp_path):
+        # the workers import the command and its models to run a task
+        options = {'batch_size': 10, 'fast': False, 'defer_indexes': False}
+        with worker_pool(2) as pool:
+            results = list(pool.map(load_part, [
+                LoadTask(name, str(tmp_path), 0, None, options)
+                for name in ('category.csv', 'genre.csv')
+            ]))
+        assert [result.name for result in results] == [
+            'category.csv', 'genre.csv'
+        ]
+        assert all(result.rows == 0 for result in results)
+        assert all('No such file' in result.error for result in results)
+
+    def test_split_rows(self):
+        assert split_rows(10, 3) == [(0, 4), (4, 8), (8, 10)]
+        assert split_rows(2, 4) == [(0, 1), (1, 2)]
+
+
+class TestCopyLayout:
+
+    def test_row_stream_reads_in_parts(self):
+        stream = RowStream([['1', 'Фильм', ''], ['2', 'a,b', 'x']])
+        data = ''
+        while True:
+            part = stream.read(5)
+            if not part:
+                break
+            data += part
+        assert data == '1,Фильм,\r\n2,"a,b",x\r\n'
+        assert stream.count == 2
+
+    @pytest.mark.django_db
+    def test_missing_columns_become_constants(self):
+        titles = next(f for f in CSV_FILES if f.model is Title)
+        mapped, constants, not_null = get_copy_layout(titles)
+        assert mapped == {
+            'id': 'id', 'name': 'name', 'year': 'year',
+            'category_id': 'category',
+        }
+        assert constants == {
+            'description': '', 'rating_sum': '0', 'rating_count': '0',
+            'rating_avg': '0.0',
+        }
+        assert 'description' in not_null
+        assert 'category_id' not in not_null
@@ -0,0 +1,36 @@
+import pytest
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db
+class TestNestedRoutes:
+
+    def test_missing_title(self, user_client):
+        assert user_client.get('/api/v1/titles/404/reviews/').status_code == 404
+        response = user_client.post(
+            '/api/v1/titles/404/reviews/', data={'text': 'a', 'score': 5}
+        )
+        assert response.status_code == 404
+
+    def test_review_under_another_title(self, user_client, user, title,
+                                        category):
+        review = Review.objects.create(title=title, author=user, text='a')
+        other = Title.objects.create(
+            name='Другое', year=2000, category=category
+        )
+        url = f'/api/v1/titles/{other.id}/reviews/{review.id}/'
+        assert user_client.get(url).status_code == 404
+        assert user_client.get(url + 'comments/').status_code == 404
+        response = user_client.post(url + 'comments/', data={'text': 'a'})
+        assert response.status_code == 404
+
+    def test_review_create_resolves_title_once(self, user_client, title,
+                                               django_assert_num_queries):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        # title check, duplicate check, insert, rating and stats updates
+        # and the savepoint pair of the rating transaction
+        with django_assert_num_queries(7):
+            response = user_client.post(url, data={'text': 'a', 'score': 5})
+        assert response.status_code == 201
+        response = user_client.post(url, data={'text': 'b', 'score': 5})
+        assert response.status_code == 400
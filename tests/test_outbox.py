@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import OperationalError
+from django.utils import timezone
+from reviews.models import OutboxEmail
+
+SIGNUP_URL = '/api/v1/auth/signup/'
+
+
+def enqueue(number):
+    return [
+        OutboxEmail.enqueue('Тема', f'Письмо {n}', 'from@example.com',
+                            f'user{n}@yamdb.fake')
+        for n in range(number)
+    ]
+
+
+@pytest.mark.django_db
+class TestOutbox:
+
+    def test_signup_only_queues(self, guest_client):
+        response = guest_client.post(SIGNUP_URL, data={
+            'username': 'new', 'email': 'new@yamdb.fake'
+        })
+        assert response.status_code == 200
+        assert mail.outbox == []
+        email = OutboxEmail.objects.get()
+        assert email.to == 'new@yamdb.fake'
+        assert email.body.startswith('Код подтверждения: ')
+
+        call_command('send_outbox', '--once')
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ['new@yamdb.fake']
+        assert mail.outbox[0].body == email.body
+        email.refresh_from_db()
+        assert email.sent_at is not None
+
+        # a repeated signup queues the code again
+        response = guest_client.post(SIGNUP_URL, data={
+            'username': 'new', 'email': 'new@yamdb.fake'
+        })
+        assert response.status_code == 400
+        assert OutboxEmail.objects.filter(sent_at__isnull=True).count() == 1
+
+    def test_batches(self, django_assert_num_queries):
+        enqueue(3)
+        # select, two savepoint statements and the update of sent rows
+        with django_assert_num_queries(4):
+            assert OutboxEmail.send_batch(2) == (2, 0)
+        call_command('send_outbox', '--once', '--batch-size', '2')
+        assert len(mail.outbox) == 3
+        assert OutboxEmail.send_batch() == (0, 0)
+
+    def test_retries_with_backoff(self, monkeypatch, settings):
+        settings.OUTBOX_RETRY_DELAY = 10
+        settings.OUTBOX_MAX_ATTEMPTS = 2
+        email, = enqueue(1)
+        send = EmailMessage.send
+
+        def broken(message, *args, **kwargs):
+            raise ConnectionError('нет связи')
+
+        monkeypatch.setattr(EmailMessage, 'send', broken)
+        assert OutboxEmail.send_batch() == (0, 1)
+        email.refresh_from_db()
+        assert email.attempts == 1
+        assert email.last_error == 'ConnectionError: нет связи'
+        delay = email.send_after - timezone.now()
+        assert timedelta(seconds=5) < delay <= timedelta(seconds=10)
+        # not due yet
+        assert OutboxEmail.send_batch() == (0, 0)
+
+        OutboxEmail.objects.update(send_after=timezone.now())
+        assert OutboxEmail.send_batch() == (0, 1)
+        email.refresh_from_db()
+        assert email.send_after - timezone.now() > timedelta(seconds=15)
+
+        # out of attempts
+        monkeypatch.setattr(EmailMessage, 'send', send)
+        OutboxEmail.objects.update(send_after=timezone.now())
+        assert OutboxEmail.send_batch() == (0, 0)
+        assert mail.outbox == []
+
+    def test_connection_not_opened(self, monkeypatch, settings):
+        settings.OUTBOX_RETRY_DELAY = 10
+        enqueue(2)
+
+        def broken(backend):
+            raise ConnectionRefusedError('сервер недоступен')
+
+        monkeypatch.setattr(EmailBackend, 'open', broken)
+        assert OutboxEmail.send_batch() == (0, 2)
+        for email in OutboxEmail.objects.all():
+            assert email.attempts == 1
+            assert email.last_error == (
+                'ConnectionRefusedError: сервер недоступен'
+            )
+            assert email.send_after > timezone.now()
+        assert mail.outbox == []
+
+    def test_worker_outlives_errors(self, monkeypatch):
+        results = [OperationalError('нет базы'), KeyboardInterrupt()]
+
+        def send_batch(size):
+            raise results.pop(0)
+
+        monkeypatch.setattr(OutboxEmail, 'send_batch', send_batch)
+        with pytest.raises(KeyboardInterrupt):
+            call_command('send_outbox', '--interval', '0')
+        assert results == []
+
+    def test_retry_delay_is_capped(self, settings):
+        settings.OUTBOX_RETRY_DELAY = 60
+        settings.OUTBOX_MAX_RETRY_DELAY = 600
+        assert OutboxEmail.retry_delay(1) == timedelta(seconds=60)
+        assert OutboxEmail.retry_delay(3) == timedelta(seconds=240)
+        assert OutboxEmail.retry_delay(10) == timedelta(seconds=600)
@@ -0,0 +1,97 @@
+import json
+from base64 import urlsafe_b64encode
+
+import pytest
+from reviews.models import Comment, Review, Title, User
+
+
+def walk(client, url, link='next'):
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.json()
+        assert 'count' not in data
+        pages.append([item['id'] for item in data['results']])
+        url = data[link]
+    return pages
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+
+    @pytest.fixture
+    def reviews(self, title):
+        User.objects.bulk_create(
+            User(username=f'reviewer-{number}',
+                 email=f'reviewer-{number}@yamdb.fake')
+            for number in range(25)
+        )
+        for author in User.objects.filter(username__startswith='reviewer-'):
+            Review.objects.create(title=title, author=author, text='a')
+
+    def test_reviews_cursor_walk(self, guest_client, title, reviews):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        expected = list(
+            Review.objects.order_by('pub_date', 'id').values_list(
+                'id', flat=True
+            )
+        )
+        pages = walk(guest_client, url + '?pagination=cursor')
+        assert [len(page) for page in pages] == [10, 10, 5]
+        assert sum(pages, []) == expected
+
+        last_page = guest_client.get(url + '?pagination=cursor').json()
+        while last_page['next']:
+            last_page = guest_client.get(last_page['next']).json()
+        backwards = walk(guest_client, last_page['previous'], 'previous')
+        assert sum(reversed(backwards), []) == expected[:20]
+
+    def test_comments_cursor_is_descending(self, guest_client, title, user):
+        review = Review.objects.create(title=title, author=user, text='a')
+        for number in range(12):
+            Comment.objects.create(review=review, author=user, text=number)
+        pages = walk(
+            guest_client,
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+            '?pagination=cursor'
+        )
+        assert sum(pages, []) == list(
+            review.comments.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def test_titles_cursor_skips_count(self, guest_client, category,
+                                       slug_caches,
+                                       django_assert_num_queries):
+        Title.objects.bulk_create(
+            Title(name=str(number), year=2000, category=category)
+            for number in range(15)
+        )
+        # titles and genre ids of the page, no COUNT(*)
+        with django_assert_num_queries(2):
+            response = guest_client.get('/api/v1/titles/?pagination=cursor')
+        next_page = guest_client.get(response.json()['next']).json()
+        assert len(next_page['results']) == 5
+        assert next_page['next'] is None
+
+    def test_page_numbers_by_default(self, guest_client, title):
+        response = guest_client.get('/api/v1/titles/')
+        assert response.json()['count'] == 1
+
+    def test_invalid_cursor(self, guest_client, title):
+        response = guest_client.get('/api/v1/titles/?cursor=broken')
+        assert response.status_code == 404
+        # well formed, but the values do not fit the ordering fields
+        urls = ('/api/v1/titles/', f'/api/v1/titles/{title.id}/reviews/')
+        for value in ('abc', None):
+            cursor = urlsafe_b64encode(
+                json.dumps({'v': [value], 'r': 0}).encode()
+            ).decode()
+            for url in urls:
+                response = guest_client.get(
+                    url, {'pagination': 'cursor', 'cursor': cursor}
+                )
+                assert response.status_code == 404
+                assert response.json() == {'detail': 'Некорректный курсор.'}
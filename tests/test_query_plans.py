@@ -0,0 +1,114 @@
+import json
+import re
+
+import pytest
+from django.db import connection
+from reviews.models import Comment, Review
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # tiny test tables are cheaper to scan, ask for the index plan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            return json.loads(plan) if isinstance(plan, str) else plan
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def sorts_rows(sql, params):
+    '''Whether the database sorts the rows instead of reading an index'''
+    plan = explain(sql, params)
+    if connection.vendor == 'postgresql':
+        return '"Sort"' in json.dumps(plan)
+    return any('TEMP B-TREE FOR ORDER BY' in detail for detail in plan)
+
+
+def full_scans(sql, params, tables):
+    '''Tables of `tables` the database reads without an index'''
+    plan = explain(sql, params)
+    if connection.vendor == 'postgresql':
+        nodes, scanned = [plan[0]['Plan']], set()
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('Plans', ()))
+            if node['Node Type'] == 'Seq Scan':
+                scanned.add(node['Relation Name'])
+        return scanned & tables
+    return {
+        table for table in tables for detail in plan
+        if re.match(rf'SCAN (TABLE )?{table}\b', detail)
+    }
+
+
+def record_queries(client, url):
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        response = client.get(url)
+    assert response.status_code == 200
+    return queries
+
+
+@pytest.fixture
+def review(title, user):
+    return Review.objects.create(title=title, author=user, text='a', score=5)
+
+
+@pytest.fixture
+def comment(review, another_user):
+    return Comment.objects.create(review=review, author=another_user, text='b')
+
+
+HOT_ENDPOINTS = [
+    ('/api/v1/titles/?genre=drama', {'reviews_genretitle'}),
+    ('/api/v1/titles/?category=movie', {'reviews_title'}),
+    ('/api/v1/titles/{title}/', {'reviews_title', 'reviews_genretitle'}),
+    ('/api/v1/titles/{title}/reviews/', {'reviews_review'}),
+    ('/api/v1/titles/{title}/reviews/?pagination=cursor', {'reviews_review'}),
+    ('/api/v1/titles/{title}/reviews/{review}/', {'reviews_review'}),
+    ('/api/v1/titles/{title}/reviews/{review}/comments/',
+     {'reviews_review', 'reviews_comment'}),
+    ('/api/v1/titles/{title}/reviews/{review}/comments/?pagination=cursor',
+     {'reviews_review', 'reviews_comment'}),
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url, tables', HOT_ENDPOINTS, ids=[url for url, _ in HOT_ENDPOINTS]
+)
+def test_hot_queries_use_indexes(url, tables, guest_client, title, review,
+                                 comment):
+    queries = record_queries(
+        guest_client, url.format(title=title.id, review=review.id)
+    )
+    for sql, params in queries:
+        assert not full_scans(sql, params, tables), (
+            f'{url}: запрос читает таблицу целиком\n{sql}'
+        )
+
+
+SORTED_ENDPOINTS = [
+    '/api/v1/titles/?ordering=-rating&pagination=cursor',
+    '/api/v1/titles/?ordering=-rating&category=movie&pagination=cursor',
+    '/api/v1/titles/?ordering=-reviews_count&pagination=cursor',
+    '/api/v1/titles/?ordering=year&pagination=cursor',
+    '/api/v1/titles/?ordering=name&pagination=cursor',
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', SORTED_ENDPOINTS)
+def test_title_orderings_read_indexes(url, guest_client, title):
+    for sql, params in record_queries(guest_client, url):
+        if 'reviews_title' in sql and 'ORDER BY' in sql:
+            assert not sorts_rows(sql, params), (
+                f'{url}: база сортирует строки вместо индекса\n{sql}'
+            )
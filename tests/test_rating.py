@@ -0,0 +1,147 @@
+import pytest
+from api.views import ReviewViewSet
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import (LeaderboardEntry, Review, Title, TitleStats,
+                            User)
+
+
+@pytest.mark.django_db
+class TestTitleRating:
+
+    def reviews_url(self, title):
+        return f'/api/v1/titles/{title.id}/reviews/'
+
+    def test_rating_follows_review_writes(self, title, user_client,
+                                          another_user_client):
+        response = user_client.post(
+            self.reviews_url(title), data={'text': 'Шедевр', 'score': 10}
+        )
+        assert response.status_code == 201
+        another_user_client.post(
+            self.reviews_url(title), data={'text': 'Неплохо', 'score': 5}
+        )
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (15, 2)
+        assert title.rating == 7.5
+        assert title.rating_avg == 7.5
+
+        review_id = response.json()['id']
+        user_client.patch(
+            f'{self.reviews_url(title)}{review_id}/', data={'score': 7}
+        )
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (12, 2)
+
+        user_client.delete(f'{self.reviews_url(title)}{review_id}/')
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (5, 1)
+        assert title.rating == 5
+
+        another_user_client.delete(
+            f'{self.reviews_url(title)}{review_id + 1}/'
+        )
+        title.refresh_from_db()
+        assert (title.rating_count, title.rating_avg) == (0, 0)
+
+    def test_orm_writes_keep_ratings(self, title, user, another_user):
+        review = Review.objects.create(
+            title=title, author=user, text='a', score=4
+        )
+        other = Title.objects.create(name='Другое', year=2000)
+        # e.g. the admin site moves the review to another title
+        review = Review.objects.get(pk=review.pk)
+        review.title, review.score = other, 6
+        review.save()
+        title.refresh_from_db()
+        other.refresh_from_db()
+        assert (title.rating_count, other.rating_sum) == (0, 6)
+        assert TitleStats.objects.get(title=other).scores[6] == 1
+
+        # reviews deleted together with their title
+        Review.objects.create(
+            title=other, author=another_user, text='b', score=8
+        )
+        other.delete()
+        assert not TitleStats.objects.filter(title_id=other.id).exists()
+
+    def test_review_writes_lock_the_row(self, title):
+        # concurrent writes of a review take back the score one by one
+        for action, locked in (('destroy', True), ('partial_update', True),
+                               ('retrieve', False)):
+            view = ReviewViewSet(action=action, kwargs={'title_id': title.id})
+            assert view.get_queryset().query.select_for_update is locked
+
+    def test_title_delete_skips_its_reviews(self, admin_client, title):
+        other = Title.objects.create(name='Другое', year=2000)
+        queries = []
+        for number in (5, 50):
+            doomed = Title.objects.create(name=f'Удаляемое {number}',
+                                          year=2000)
+            for n in range(number):
+                author = User.objects.create(
+                    username=f'critic-{number}-{n}',
+                    email=f'critic-{number}-{n}@yamdb.fake',
+                )
+                Review.objects.create(
+                    title=doomed, author=author, text='a', score=5
+                )
+            Review.objects.create(
+                title=other, author=author, text='b', score=7
+            )
+            with CaptureQueriesContext(connection) as context:
+                response = admin_client.delete(f'/api/v1/titles/{doomed.id}/')
+            assert response.status_code == 204
+            queries.append(len(context.captured_queries))
+        # the cascade is a few batch deletes, no work per review
+        assert queries[0] == queries[1]
+        other.refresh_from_db()
+        assert (other.rating_sum, other.rating_count) == (14, 2)
+
+    def test_rating_is_read_without_queries(self, title,
+                                            django_assert_num_queries):
+        Title.objects.filter(pk=title.pk).update(rating_sum=9, rating_count=2)
+        title.refresh_from_db()
+        with django_assert_num_queries(0):
+            assert title.rating == 4.5
+
+    def test_rebuild_ratings_command(self, title, user, another_user):
+        Review.objects.bulk_create([
+            Review(title=title, author=user, text='a', score=4),
+            Review(title=title, author=another_user, text='b', score=9),
+        ])
+        title.refresh_from_db()
+        assert title.rating is None
+
+        call_command('rebuild_ratings')
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (13, 2)
+        assert title.rating == 6.5
+        assert title.rating_avg == 6.5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleting_author_updates_title(title, user, user_client,
+                                       admin_client, guest_client, settings):
+    settings.LEADERBOARD_MIN_REVIEWS = 1
+    response = user_client.post(
+        f'/api/v1/titles/{title.id}/reviews/', data={'text': 'a', 'score': 8}
+    )
+    assert response.status_code == 201
+    assert LeaderboardEntry.objects.filter(title=title).exists()
+
+    response = admin_client.delete(f'/api/v1/users/{user.username}/')
+    assert response.status_code == 204
+    assert Review.objects.count() == 0
+    title.refresh_from_db()
+    assert (title.rating_sum, title.rating_count, title.rating_avg) == (
+        0, 0, 0
+    )
+    stats = TitleStats.objects.get(title=title)
+    assert (stats.total, stats.scores[8], stats.last_review_at) == (
+        0, 0, None
+    )
+    assert not LeaderboardEntry.objects.filter(title=title).exists()
+    response = guest_client.get(f'/api/v1/titles/{title.id}/')
+    assert response.json()['rating'] is None
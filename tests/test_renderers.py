@@ -0,0 +1,107 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from api import parsers, renderers
+from api.parsers import FastJSONParser, NDJSONParser
+from api.renderers import FastJSONRenderer
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from reviews.models import Review
+
+# opt-in benchmark, e.g. YAMDB_RENDER_REPEAT=1000
+RENDER_REPEAT = int(os.getenv('YAMDB_RENDER_REPEAT', 0))
+
+DATA = {
+    'name': 'Побег из Шоушенка',
+    'created': datetime(2021, 8, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    'price': Decimal('9.90'),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'scores': {0: 1, 10: 2},
+    'text': 'строка\u2028дальше',
+    'results': [{'id': 1, 'rating': None}],
+}
+
+
+class Stream:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class TestFastJSON:
+
+    def test_same_as_json_renderer(self):
+        expected = JSONRenderer().render(DATA)
+        assert FastJSONRenderer().render(DATA) == expected
+
+    def test_stdlib_fallback(self, monkeypatch):
+        monkeypatch.setattr(renderers, 'orjson', None)
+        assert FastJSONRenderer().render(DATA) == JSONRenderer().render(DATA)
+        # indented output is left to the stdlib encoder as well
+        assert FastJSONRenderer().render(
+            DATA, 'application/json; indent=4'
+        ) == JSONRenderer().render(DATA, 'application/json; indent=4')
+
+    def test_parser(self, monkeypatch):
+        body = json.dumps(DATA['results'], ensure_ascii=False).encode()
+        assert FastJSONParser().parse(Stream(body)) == DATA['results']
+        with pytest.raises(ParseError):
+            FastJSONParser().parse(Stream(b'{"name": '))
+        monkeypatch.setattr(parsers, 'orjson', None)
+        assert NDJSONParser().parse([b'{"id": 1}\n', b'\n']) == [{'id': 1}]
+
+
+@pytest.mark.django_db
+class TestApiJSON:
+
+    def test_responses_and_requests(self, admin_client, title, user):
+        review = Review.objects.create(
+            title=title, author=user, text='Отзыв\u2029', score=7
+        )
+        response = admin_client.get(f'/api/v1/titles/{title.id}/reviews/')
+        assert response['Content-Type'] == 'application/json'
+        assert b'\\u2029' in response.content
+        assert response.json()['results'][0]['id'] == review.id
+
+        response = admin_client.patch(
+            f'/api/v1/titles/{title.id}/', data=b'{"name": "\xd0\x98"}',
+            content_type='application/json',
+        )
+        assert response.json()['name'] == 'И'
+        response = admin_client.patch(
+            f'/api/v1/titles/{title.id}/', data=b'{"name"',
+            content_type='application/json',
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not RENDER_REPEAT, reason='задайте YAMDB_RENDER_REPEAT')
+def test_render_throughput(guest_client, title, user, capsys):
+    Review.objects.create(title=title, author=user, text='Отзыв' * 20,
+                          score=5)
+    pages = [
+        guest_client.get('/api/v1/titles/').data,
+        guest_client.get(f'/api/v1/titles/{title.id}/reviews/').data,
+    ]
+    rates = {}
+    for renderer in (JSONRenderer(), FastJSONRenderer()):
+        started = time.perf_counter()
+        for _ in range(RENDER_REPEAT):
+            for page in pages:
+                renderer.render(page)
+        rates[type(renderer).__name__] = (
+            RENDER_REPEAT * len(pages) / (time.perf_counter() - started)
+        )
+    with capsys.disabled():
+        print('\n' + ', '.join(
+            f'{name}: {rate:.0f} страниц/с' for name, rate in rates.items()
+        ))
+    assert rates['FastJSONRenderer'] > rates['JSONRenderer']
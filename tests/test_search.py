@@ -0,0 +1,116 @@
+import pytest
+from api.search import PythonSearchBackend, similarity
+from reviews.models import Comment, Review, Title
+
+
+@pytest.fixture
+def titles(category):
+    return [
+        Title.objects.create(
+            name='Побег из Шоушенка', year=1994, category=category,
+            description='Тюремная драма',
+        ),
+        Title.objects.create(
+            name='Зелёная миля', year=1999, category=category,
+            description='Драма, где побег от смерти невозможен',
+        ),
+        Title.objects.create(name='Форрест Гамп', year=1994),
+    ]
+
+
+def search_names(client, text):
+    response = client.get('/api/v1/titles/', {'search': text})
+    assert response.status_code == 200
+    return [title['name'] for title in response.json()['results']]
+
+
+class TestSimilarity:
+
+    def test_typo_is_similar(self):
+        assert similarity('Шоушенк', 'Побег из Шоушенка') > 0.3
+        assert similarity('Гамп', 'Побег из Шоушенка') == 0
+
+
+@pytest.mark.django_db
+class TestTitleSearch:
+
+    def test_name_ranks_above_description(self, guest_client, titles):
+        assert search_names(guest_client, 'побег') == [
+            'Побег из Шоушенка', 'Зелёная миля'
+        ]
+
+    def test_every_word_must_match(self, guest_client, titles):
+        assert search_names(guest_client, 'драма смерти') == ['Зелёная миля']
+        assert search_names(guest_client, 'драма гамп') == []
+
+    def test_typo_falls_back_to_trigrams(self, guest_client, titles):
+        assert search_names(guest_client, 'Шоушенко') == ['Побег из Шоушенка']
+
+    def test_search_combines_with_filters(self, guest_client, titles):
+        response = guest_client.get(
+            '/api/v1/titles/', {'search': 'драма', 'year': 1999}
+        )
+        assert [title['name'] for title in response.json()['results']] == [
+            'Зелёная миля'
+        ]
+
+    def test_edit_is_found(self, guest_client, admin_client, titles):
+        assert search_names(guest_client, 'Матрица') == []
+        admin_client.patch(
+            f'/api/v1/titles/{titles[2].id}/', data={'name': 'Матрица'}
+        )
+        assert search_names(guest_client, 'Матрица') == ['Матрица']
+
+    def test_index_is_reused_until_change(self, titles,
+                                          django_assert_num_queries):
+        backend = PythonSearchBackend()
+        backend.search(Title.objects.all(), 'побег')
+        with django_assert_num_queries(0):
+            backend.get_index(Title)
+        Title.objects.create(name='Побег', year=2000)
+        with django_assert_num_queries(1):
+            backend.get_index(Title)
+
+
+@pytest.mark.django_db
+class TestReviewSearch:
+
+    def test_reviews_and_comments(self, guest_client, user, another_user,
+                                  title):
+        review = Review.objects.create(
+            title=title, author=user, text='Лучший фильм о надежде', score=10
+        )
+        Review.objects.create(
+            title=title, author=another_user, text='Скучно', score=3
+        )
+        Comment.objects.create(
+            review=review, author=another_user, text='Согласен про надежду'
+        )
+
+        response = guest_client.get(
+            '/api/v1/search/reviews/', {'search': 'надежде'}
+        )
+        results = response.json()['results']
+        assert [(item['id'], item['title']) for item in results] == [
+            (review.id, title.id)
+        ]
+        response = guest_client.get(
+            '/api/v1/search/comments/', {'search': 'надежду'}
+        )
+        results = response.json()['results']
+        assert len(results) == 1
+        assert results[0]['review'] == review.id
+        assert results[0]['title'] == title.id
+
+    def test_query_is_required(self, guest_client, user, title):
+        Review.objects.create(title=title, author=user, text='Текст', score=5)
+        response = guest_client.get('/api/v1/search/reviews/')
+        assert response.status_code == 200
+        assert response.json()['results'] == []
+
+    def test_search_is_read_only(self, user_client):
+        response = user_client.post(
+            '/api/v1/search/reviews/', data={'text': 'a', 'score': 1}
+        )
+        assert response.status_code in (403, 405)
+        assert not Review.objects.exists()
@@ -0,0 +1,83 @@
+import pytest
+from api import slugs
+from api.slugs import SlugCache
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db
+class TestSlugCache:
+
+    def test_loads_once_until_changed(self, genres,
+                                      django_assert_num_queries):
+        cache = SlugCache(Genre, 'genres')
+        with django_assert_num_queries(1):
+            assert cache.get_ids(['comedy', 'missing', 'drama']) == [
+                genres[1].id, genres[0].id
+            ]
+            assert cache.get_id('drama') == genres[0].id
+            assert cache.serialize(genres[1].id) == {
+                'name': 'Комедия', 'slug': 'comedy'
+            }
+
+        Genre.objects.create(name='Ужасы', slug='horror')
+        with django_assert_num_queries(1):
+            assert cache.get_id('horror') is not None
+        genres[0].delete()
+        assert cache.get_id('drama') is None
+
+    def test_workers_share_versions(self, category):
+        first = SlugCache(Category, 'categories')
+        second = SlugCache(Category, 'categories')
+        assert first.get_id('movie') == second.get_id('movie')
+        category.slug = 'film'
+        category.save()
+        # the save bumped the shared version both caches read
+        assert first.get_id('film') == second.get_id('film') == category.id
+
+    def test_version_checked_once_per_page(self, guest_client, category,
+                                           genres, slug_caches, monkeypatch):
+        for number in range(10):
+            title = Title.objects.create(
+                name=f'Фильм {number}', year=2000, category=category
+            )
+            title.genre.set(genres)
+        checks = []
+
+        def get_versions(scopes):
+            checks.extend(scopes)
+            return versions(scopes)
+
+        versions = slugs.get_versions
+        monkeypatch.setattr(slugs, 'get_versions', get_versions)
+        response = guest_client.get(
+            '/api/v1/titles/', {'genre': 'drama', 'category': 'movie'}
+        )
+        assert len(response.json()['results']) == 10
+        # once by each filter and once for all the rows by the serializer
+        assert sorted(checks) == [
+            'categories', 'categories', 'genres', 'genres'
+        ]
+
+    def test_title_writes_resolve_slugs_from_cache(
+            self, admin_client, category, genres, slug_caches,
+            django_assert_num_queries):
+        # title and stats inserts, the genre links (two reads by set()
+        # and an insert) and the genres of the response, no slug lookups
+        with django_assert_num_queries(6):
+            response = admin_client.post('/api/v1/titles/', data={
+                'name': 'Новое', 'year': 2000, 'category': 'movie',
+                'genre': ['drama', 'comedy'],
+            }, format='json')
+        assert response.status_code == 201
+        assert response.json()['category'] == 'movie'
+        title = Title.objects.get(pk=response.json()['id'])
+        assert title.category_id == category.id
+        assert set(title.genre.all()) == set(genres)
+
+    def test_unknown_slug(self, admin_client, genres, slug_caches):
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Новое', 'year': 2000, 'category': 'missing',
+            'genre': ['drama'],
+        }, format='json')
+        assert response.status_code == 400
+        assert 'category' in response.json()
@@ -0,0 +1,76 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import Comment, Review, Title
+
+
+@pytest.fixture
+def comment(title, user, another_user):
+    review = Review.objects.create(
+        title=title, author=user, text='Отзыв', score=8
+    )
+    return Comment.objects.create(review=review, author=another_user,
+                                  text='Комментарий')
+
+
+def get(client, url, **params):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, params)
+    assert response.status_code == 200, response.json()
+    return response.json(), [query['sql'] for query in context]
+
+
+@pytest.mark.django_db
+class TestSparseFields:
+
+    def test_lean_titles(self, guest_client, title, slug_caches):
+        data, queries = get(guest_client, '/api/v1/titles/', fields='id,name')
+        assert data['results'] == [{'id': title.id, 'name': title.name}]
+        # the count and the page, no genres
+        assert len(queries) == 2
+        assert 'description' not in queries[1]
+        assert 'rating_sum' not in queries[1]
+
+        data, queries = get(guest_client, f'/api/v1/titles/{title.id}/',
+                            fields='name,genre', expand='stats')
+        assert list(data) == ['name', 'genre', 'stats']
+        assert len(data['genre']) == 2
+        assert data['stats']['total'] == 0
+        assert len(queries) == 2
+
+    def test_cursor_pages_of_lean_titles(self, guest_client, category):
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {n}', year=2000 + n) for n in range(12)
+        )
+        data, _ = get(guest_client, '/api/v1/titles/', fields='name',
+                      ordering='-year', pagination='cursor')
+        assert data['results'][0] == {'name': 'Произведение 11'}
+        data = guest_client.get(data['next']).json()
+        assert [title['name'] for title in data['results']] == [
+            'Произведение 1', 'Произведение 0'
+        ]
+
+    def test_reviews_and_comments(self, guest_client, comment):
+        review = comment.review
+        url = f'/api/v1/titles/{review.title_id}/reviews/'
+        data, queries = get(guest_client, url, fields='id,score')
+        assert data['results'] == [{'id': review.id, 'score': 8}]
+        assert 'reviews_user' not in queries[-1]
+
+        data, _ = get(guest_client, f'{url}{review.id}/', fields='id',
+                      expand='title')
+        assert data == {'id': review.id, 'title': {
+            'id': review.title_id, 'name': 'Побег из Шоушенка', 'year': 1994,
+        }}
+
+        data, _ = get(guest_client, f'{url}{review.id}/comments/',
+                      fields='text', expand='review')
+        assert data['results'] == [{
+            'text': 'Комментарий',
+            'review': {'id': review.id, 'author': 'TestUser', 'score': 8},
+        }]
+
+    def test_unknown_names(self, guest_client, title):
+        for params in ({'fields': 'id,password'}, {'expand': 'author'}):
+            response = guest_client.get('/api/v1/titles/', params)
+            assert response.status_code == 400
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import time
+
+import pytest
+from django.db import connection
+from reviews.models import Title
+
+# opt-in benchmark on postgres, e.g. YAMDB_TRGM_ROWS=1000000
+TRGM_ROWS = int(os.getenv('YAMDB_TRGM_ROWS', 0))
+
+
+def add_titles(start, stop):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO reviews_title (name, year, rating_sum, rating_count)'
+            " SELECT 'Произведение ' || md5(i::text), 2000, 0, 0"
+            ' FROM generate_series(%s, %s) AS i',
+            [start, stop - 1],
+        )
+        cursor.execute('ANALYZE reviews_title')
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def timed(queryset, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+@pytest.mark.django_db
+class TestSubstringFilters:
+
+    def test_title_name_ignores_case(self, guest_client, title):
+        Title.objects.create(name='The Shawshank Redemption', year=1994)
+        response = guest_client.get('/api/v1/titles/', {'name': 'SHAWSHANK'})
+        assert response.json()['count'] == 1
+        response = guest_client.get('/api/v1/titles/', {'name': 'Матрица'})
+        assert response.json()['count'] == 0
+
+    def test_user_search(self, admin_client, user, another_user):
+        response = admin_client.get(
+            '/api/v1/users/', {'search': 'useranother'}
+        )
+        usernames = [item['username'] for item in response.json()['results']]
+        assert usernames == [another_user.username]
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not TRGM_ROWS, reason='задайте YAMDB_TRGM_ROWS')
+def test_name_filter_is_sublinear():
+    if connection.vendor != 'postgresql':
+        pytest.skip('trigram индексы есть только в postgresql')
+    needle = 'Произведение ' + hashlib.md5(b'7').hexdigest()
+    queryset = Title.objects.filter(name__icontains=needle[-12:])
+
+    add_titles(0, TRGM_ROWS // 10)
+    small = timed(queryset)
+    add_titles(TRGM_ROWS // 10, TRGM_ROWS)
+    large = timed(queryset)
+
+    assert 'reviews_title_name_trgm_idx' in json.dumps(explain(queryset))
+    # ten times the rows must cost well under ten times the time
+    assert large < small * 5, (
+        f'{TRGM_ROWS // 10} строк: {small * 1000:.2f} мс, '
+        f'{TRGM_ROWS} строк: {large * 1000:.2f} мс'
+    )
@@ -0,0 +1,67 @@
+import pytest
+from api.pagination import KeysetPagination
+from reviews.models import Category, Title
+
+
+@pytest.fixture
+def ranked_titles(category, genres):
+    other = Category.objects.create(name='Книга', slug='book')
+    rows = [
+        # name, year, category, rating sum, review count
+        ('Б', 2001, category, 18, 2),
+        ('А', 1999, other, 7, 1),
+        ('В', 2010, category, 27, 3),
+        ('Г', 1999, category, 0, 0),
+    ]
+    titles = []
+    for name, year, title_category, total, count in rows:
+        title = Title.objects.create(
+            name=name, year=year, category=title_category,
+            rating_sum=total, rating_count=count,
+            rating_avg=total / count if count else 0,
+        )
+        title.genre.set(genres[:1] if year == 1999 else genres)
+        titles.append(title)
+    return titles
+
+
+def names(client, **params):
+    response = client.get('/api/v1/titles/', params)
+    assert response.status_code == 200
+    return [title['name'] for title in response.json()['results']]
+
+
+@pytest.mark.django_db
+class TestTitleOrdering:
+
+    @pytest.mark.parametrize('ordering, expected', [
+        # equal ratings are ordered by id in the same direction
+        ('-rating', ['В', 'Б', 'А', 'Г']),
+        ('rating', ['Г', 'А', 'Б', 'В']),
+        ('-reviews_count', ['В', 'Б', 'А', 'Г']),
+        ('year', ['А', 'Г', 'Б', 'В']),
+        ('name', ['А', 'Б', 'В', 'Г']),
+        ('unknown', ['Б', 'А', 'В', 'Г']),
+    ])
+    def test_orderings(self, guest_client, ranked_titles, ordering,
+                       expected):
+        assert names(guest_client, ordering=ordering) == expected
+
+    def test_ordering_with_filters(self, guest_client, ranked_titles):
+        assert names(
+            guest_client, ordering='-rating', category='movie'
+        ) == ['В', 'Б', 'Г']
+        assert names(
+            guest_client, ordering='-rating', genre='comedy'
+        ) == ['В', 'Б']
+
+    def test_cursor_pages_follow_ordering(self, guest_client, ranked_titles,
+                                          monkeypatch):
+        monkeypatch.setattr(KeysetPagination, 'page_size', 1)
+        url = '/api/v1/titles/?ordering=-rating&pagination=cursor'
+        seen = []
+        while url:
+            page = guest_client.get(url).json()
+            seen.extend(title['name'] for title in page['results'])
+            url = page['next']
+        assert seen == ['В', 'Б', 'А', 'Г']
@@ -0,0 +1,79 @@
+import pytest
+from django.core.management import call_command
+from reviews.models import Review, TitleStats
+
+
+def get_stats(client, title):
+    response = client.get(f'/api/v1/titles/{title.id}/stats/')
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.django_db
+class TestTitleStats:
+
+    def test_unreviewed_title(self, guest_client, title):
+        stats = get_stats(guest_client, title)
+        assert stats['total'] == 0
+        assert stats['scores'] == {str(score): 0 for score in range(11)}
+        assert stats['last_review_at'] is None
+
+    def test_missing_title(self, guest_client):
+        assert guest_client.get('/api/v1/titles/1/stats/').status_code == 404
+        response = guest_client.get('/api/v1/titles/abc/stats/')
+        assert response.status_code == 404
+
+    def test_review_writes_move_buckets(self, guest_client, user_client,
+                                        another_user_client, title):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        first = user_client.post(url, data={'text': 'a', 'score': 9}).json()
+        another_user_client.post(url, data={'text': 'b', 'score': 9})
+        stats = get_stats(guest_client, title)
+        assert stats['total'] == 2
+        assert stats['scores']['9'] == 2
+        latest = Review.objects.latest('pub_date').pub_date
+        assert stats['last_review_at'] == latest.isoformat().replace(
+            '+00:00', 'Z'
+        )
+
+        user_client.patch(f'{url}{first["id"]}/', data={'score': 3})
+        stats = get_stats(guest_client, title)
+        assert (stats['total'], stats['scores']['9'],
+                stats['scores']['3']) == (2, 1, 1)
+
+        user_client.delete(f'{url}{first["id"]}/')
+        stats = get_stats(guest_client, title)
+        assert (stats['total'], stats['scores']['3']) == (1, 0)
+
+    def test_served_from_one_row(self, guest_client, user_client, title,
+                                 django_assert_num_queries):
+        user_client.post(
+            f'/api/v1/titles/{title.id}/reviews/', data={'text': 'a', 'score': 5}
+        )
+        with django_assert_num_queries(1):
+            guest_client.get(f'/api/v1/titles/{title.id}/stats/')
+
+    def test_expand_on_titles(self, guest_client, user_client, title):
+        user_client.post(
+            f'/api/v1/titles/{title.id}/reviews/', data={'text': 'a', 'score': 7}
+        )
+        plain = guest_client.get('/api/v1/titles/').json()['results'][0]
+        assert 'stats' not in plain
+        expanded = guest_client.get(
+            '/api/v1/titles/', {'expand': 'stats'}
+        ).json()['results'][0]
+        assert expanded['stats']['scores']['7'] == 1
+        detail = guest_client.get(
+            f'/api/v1/titles/{title.id}/', {'expand': 'stats'}
+        ).json()
+        assert detail['stats']['total'] == 1
+
+    def test_rebuild(self, title, user, another_user):
+        Review.objects.create(title=title, author=user, text='a', score=4)
+        Review.objects.create(
+            title=title, author=another_user, text='b', score=10
+        )
+        call_command('rebuild_ratings')
+        stats = TitleStats.objects.get(title=title)
+        assert (stats.total, stats.score_4, stats.score_10) == (2, 1, 1)
+        assert stats.scores[0] == 0
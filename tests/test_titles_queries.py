@@ -0,0 +1,35 @@
+import pytest
+from reviews.models import Title
+
+
+@pytest.mark.django_db
+class TestTitleQueries:
+
+    def create_titles(self, count, category, genres):
+        for number in range(count):
+            title = Title.objects.create(
+                name=f'Произведение {number}', year=2000, category=category,
+                rating_sum=number, rating_count=1,
+            )
+            title.genre.set(genres)
+
+    @pytest.mark.parametrize('count', [1, 10])
+    def test_list_query_count_is_constant(self, guest_client, category,
+                                          genres, count, slug_caches,
+                                          django_assert_num_queries):
+        self.create_titles(count, category, genres)
+        # page count, titles, genre ids of the page
+        with django_assert_num_queries(3):
+            response = guest_client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert len(results) == count
+        assert results[0]['category'] == {'name': 'Фильм', 'slug': 'movie'}
+        assert len(results[0]['genre']) == 2
+
+    def test_retrieve_query_count(self, guest_client, title, slug_caches,
+                                  django_assert_num_queries):
+        with django_assert_num_queries(2):
+            response = guest_client.get(f'/api/v1/titles/{title.id}/')
+        assert response.status_code == 200
+        assert response.json()['category']['slug'] == 'movie'
@@ -0,0 +1,159 @@
+import csv
+import io
+import os
+import time
+
+import pytest
+from api.serializers import (CommentSearchSerializer, CommentSerializer,
+                             CommentValuesSerializer, ReviewSearchSerializer,
+                             ReviewValuesSerializer, TitleListSerializer,
+                             TitleStatsSerializer, TitleValuesSerializer,
+                             UserValuesSerializer, UserViewSetSerializer)
+from reviews.models import Comment, Review, Title, TitleStats, User
+
+# opt-in micro-benchmark, e.g. YAMDB_SERIALIZER_ROWS=10000
+SERIALIZER_ROWS = int(os.getenv('YAMDB_SERIALIZER_ROWS', 0))
+
+
+@pytest.fixture
+def comment(title, user, another_user):
+    review = Review.objects.create(
+        title=title, author=user, text='Отзыв', score=8
+    )
+    return Comment.objects.create(review=review, author=another_user,
+                                  text='Комментарий')
+
+
+def values(serializer_class, queryset, context=None):
+    return serializer_class(
+        serializer_class(context=context).project(queryset), many=True,
+        context=context,
+    ).data
+
+
+@pytest.mark.django_db
+class TestValuesSerializers:
+
+    def test_same_output_as_model_serializers(self, comment, admin):
+        for model_serializer, serializer, queryset in (
+            (UserViewSetSerializer, UserValuesSerializer, User.objects.all()),
+            (ReviewSearchSerializer, ReviewValuesSerializer,
+             Review.objects.all()),
+            (CommentSearchSerializer, CommentValuesSerializer,
+             Comment.objects.all()),
+        ):
+            expected = model_serializer(queryset, many=True).data
+            data = values(serializer, queryset)
+            assert len(data) == len(expected) > 0
+            for item, model_item in zip(data, expected):
+                assert item == {
+                    name: model_item[name] for name in item
+                }
+
+    def test_titles_same_output(self, title, genres, slug_caches):
+        Title.objects.create(name='Без категории', year=2000)
+        TitleStats.record(title.id, added=9)
+        Title.change_rating(title.id, 9, 1)
+        queryset = Title.objects.prefetch_related('genres_of_title')
+        expected = TitleListSerializer(queryset, many=True).data
+        assert values(TitleValuesSerializer, queryset) == expected
+        data = values(TitleValuesSerializer, queryset, {'expand': ['stats']})
+        assert [item.pop('stats') for item in data] == [
+            TitleStatsSerializer(
+                TitleStats.objects.filter(title=title).first()
+                or TitleStats(title=title)
+            ).data
+            for title in queryset
+        ]
+        assert data == expected
+
+    def test_title_views_read_rows(self, guest_client, title, slug_caches,
+                                   django_assert_num_queries):
+        # count, the page and the genre ids of the page
+        with django_assert_num_queries(3):
+            response = guest_client.get('/api/v1/titles/?expand=stats')
+        result = response.json()['results'][0]
+        assert result['genre'] == [
+            {'name': 'Комедия', 'slug': 'comedy'},
+            {'name': 'Драма', 'slug': 'drama'},
+        ]
+        assert result['stats']['total'] == 0
+        response = guest_client.get(
+            '/api/v1/titles/?ordering=-rating&pagination=cursor'
+        )
+        assert response.json()['results'][0]['id'] == title.id
+        assert guest_client.get('/api/v1/titles/100500/').status_code == 404
+
+    def test_malformed_pk_is_not_found(self, guest_client, comment):
+        review = comment.review
+        for url in (
+            '/api/v1/titles/abc/',
+            f'/api/v1/titles/{review.title_id}/reviews/abc/',
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}'
+            '/comments/abc/',
+        ):
+            assert guest_client.get(url).status_code == 404, url
+
+    def test_one_query_without_instances(self, comment,
+                                         django_assert_num_queries):
+        with django_assert_num_queries(1):
+            data = values(CommentValuesSerializer, Comment.objects.all())
+        assert data[0]['author'] == 'TestUserAnother'
+
+    def test_users_list_and_export(self, admin_client, user, admin,
+                                   django_assert_max_num_queries):
+        with django_assert_max_num_queries(2):
+            response = admin_client.get('/api/v1/users/', {'search': 'Test'})
+        assert response.json()['count'] == 2
+        assert response.json()['results'][0]['role'] == 'admin'
+
+        response = admin_client.get('/api/v1/users/export/?output=csv')
+        rows = list(csv.DictReader(io.StringIO(
+            b''.join(response.streaming_content).decode()
+        )))
+        assert [row['username'] for row in rows] == [
+            admin.username, user.username
+        ]
+        assert set(rows[0]) == set(UserViewSetSerializer.Meta.fields)
+
+    def test_export_only_admin(self, user_client):
+        assert user_client.get('/api/v1/users/export/').status_code == 403
+
+    def test_admin_changelist(self, comment, client, django_user_model,
+                              django_assert_max_num_queries):
+        superuser = django_user_model.objects.create_superuser(
+            username='root', email='root@yamdb.fake', password='1234567'
+        )
+        client.force_login(superuser)
+        Review.objects.create(title=comment.review.title, author=superuser,
+                              text='Ещё', score=2)
+        # session, user, one count and the page joined with its relations
+        with django_assert_max_num_queries(4):
+            response = client.get('/admin/reviews/review/')
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not SERIALIZER_ROWS,
+                    reason='задайте YAMDB_SERIALIZER_ROWS')
+def test_serializations_per_second(comment, capsys):
+    review = comment.review
+    Comment.objects.bulk_create(
+        Comment(review=review, author=review.author, text=f'Текст {n}')
+        for n in range(SERIALIZER_ROWS)
+    )
+    queryset = Comment.objects.select_related('author')
+
+    started = time.perf_counter()
+    CommentSerializer(list(queryset), many=True).data
+    model_rate = SERIALIZER_ROWS / (time.perf_counter() - started)
+    started = time.perf_counter()
+    values(CommentValuesSerializer, queryset)
+    values_rate = SERIALIZER_ROWS / (time.perf_counter() - started)
+
+    with capsys.disabled():
+        print(
+            f'\nModelSerializer: {model_rate:.0f} строк/с, '
+            f'ValuesSerializer: {values_rate:.0f} строк/с'
+        )
+    assert values_rate > model_rate